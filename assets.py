@@ -0,0 +1,159 @@
+"""
+Process-wide registry of the game's images, fonts and window.
+
+Every image in imgs/ is decoded and converted once per process, and the Base images
+are scaled once. Character, Cliff and Base in drawables.py share the same
+surfaces, so they must treat them as read-only.
+"""
+import glob
+import os
+from collections import OrderedDict
+
+import pygame
+
+import sim
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(ROOT, 'imgs')
+
+_images = {}
+_base_images = []
+_fonts = {}
+_texts = {}
+
+
+def screen(size):
+    """
+    Open the window, or reuse it if one of this size is already open.
+    """
+    if not pygame.get_init():
+        pygame.init()
+    surface = pygame.display.get_surface()
+    if surface is None or surface.get_size() != size:
+        surface = pygame.display.set_mode(size)
+    return surface
+
+
+def image(path):
+    """
+    :param path: str, image path such as 'imgs/Tuck.png', relative to the repository
+    :return: pygame.Surface, decoded and converted the first time the path is asked for
+    """
+    key = os.path.normpath(os.path.join(ROOT, path))
+    if key not in _images:
+        surface = pygame.image.load(key)
+        # convert_alpha needs a display mode, plain surfaces still work for masks
+        _images[key] = surface.convert_alpha() if pygame.display.get_surface() else surface
+    return _images[key]
+
+
+def images(paths):
+    """
+    :param paths: dict of name -> image path
+    :return: dict of name -> shared surface
+    """
+    return {name: image(path) for name, path in paths.items()}
+
+
+def base_images():
+    """
+    :return: list of the five Base images, each scaled up by sim.BASE_PADDING
+    """
+    if not _base_images:
+        for i in range(0, 5):
+            base_image = image(f'imgs/Base{i}.png')
+            width = base_image.get_width() + sim.BASE_PADDING[0]
+            height = base_image.get_height() + sim.BASE_PADDING[1]
+            _base_images.append(pygame.transform.scale(base_image, (width, height)))
+    return _base_images
+
+
+def font(size):
+    """
+    :return: the default pygame font at `size`, created once
+    """
+    if size not in _fonts:
+        _fonts[size] = pygame.font.Font(None, size)
+    return _fonts[size]
+
+
+def text(message, size, color):
+    """
+    :return: pygame.Surface of `message` in the default font, rendered once per message, size and color
+    """
+    key = (message, size, color)
+    if key not in _texts:
+        if len(_texts) >= 256:
+            _texts.clear()  # Labels that change every frame must not grow this forever
+        _texts[key] = font(size).render(message, True, color)
+    return _texts[key]
+
+
+class RotationCache:
+    """
+    Pre-rotated copies of sprites at a fixed angle step, bounded by a memory limit.
+
+    Angles are rounded to the nearest `step` degrees. Each entry keeps the rotated surface,
+    trimmed to its opaque pixels, and the offset that keeps it centered over the unrotated
+    sprite. When the cache grows past `max_bytes`, the least recently used entries are dropped.
+    """
+    def __init__(self, step=2, max_bytes=64 * 1024 * 1024):
+        self.step = step
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, surface, angle):
+        """
+        :param key: hashable name for the sprite, e.g. its path
+        :param surface: unrotated pygame.Surface
+        :param angle: float, counter-clockwise degrees as for pygame.transform.rotate
+        :return: (rotated surface, (dx, dy) from the unrotated topleft to the rotated topleft)
+        """
+        index = round(angle / self.step) % round(360 / self.step)
+        entry = self.entries.get((key, index))
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end((key, index))
+            return entry
+        self.misses += 1
+        rotated = pygame.transform.rotate(surface, index * self.step)
+        width, height = surface.get_size()
+        rotated_width, rotated_height = rotated.get_size()
+        # Trim the transparent border, it costs blitting time and makes dirty regions larger
+        bounds = rotated.get_bounding_rect()
+        offset = (width // 2 - rotated_width // 2 + bounds.x, height // 2 - rotated_height // 2 + bounds.y)
+        rotated = rotated.subsurface(bounds).copy()
+        rotated_width, rotated_height = rotated.get_size()
+        entry = (rotated, offset)
+        self.entries[(key, index)] = entry
+        self.bytes += rotated.get_bytesize() * rotated_width * rotated_height
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, (old, _) = self.entries.popitem(last=False)
+            self.bytes -= old.get_bytesize() * old.get_width() * old.get_height()
+        return entry
+
+    def warm(self, key, surface):
+        """
+        Build every angle for one sprite ahead of time, as far as the memory limit allows.
+        """
+        for index in range(round(360 / self.step)):
+            self.get(key, surface, index * self.step)
+
+    def __str__(self):
+        return f"{len(self.entries)} rotations, {self.bytes // 1024} KiB, {self.hits} hits, {self.misses} misses"
+
+
+rotations = RotationCache()
+
+
+def preload():
+    """
+    Decode every image in imgs/ and scale the Base images up front.
+    """
+    for path in sorted(glob.glob(os.path.join(IMAGE_DIR, '*.png'))):
+        image(path)
+    base_images()
@@ -0,0 +1,145 @@
+"""
+Batched evaluation of a whole generation of feed-forward NEAT networks.
+
+BatchNetwork.create compiles every genome into one padded weight matrix, then
+evaluates all networks layer by layer with a single matrix product per layer. It
+gives the same outputs as neat.nn.FeedForwardNetwork up to float summation order.
+"""
+import numpy as np
+import neat
+from neat.graphs import feed_forward_layers
+
+
+def _clip(z, low, high):
+    return np.minimum(high, np.maximum(low, z))
+
+
+def _inv(z):
+    with np.errstate(divide='ignore', over='ignore'):
+        out = 1.0 / z
+    return np.where((z == 0) | ~np.isfinite(out), 0.0, out)
+
+
+# NumPy versions of neat.activations, with the same clamping
+activations = {
+    'sigmoid': lambda z: 1.0 / (1.0 + np.exp(-_clip(5.0 * z, -60.0, 60.0))),
+    'tanh': lambda z: np.tanh(_clip(2.5 * z, -60.0, 60.0)),
+    'sin': lambda z: np.sin(_clip(5.0 * z, -60.0, 60.0)),
+    'gauss': lambda z: np.exp(-5.0 * _clip(z, -3.4, 3.4) ** 2),
+    'relu': lambda z: np.where(z > 0.0, z, 0.0),
+    'softplus': lambda z: 0.2 * np.log(1 + np.exp(_clip(5.0 * z, -60.0, 60.0))),
+    'identity': lambda z: z,
+    'clamped': lambda z: _clip(z, -1.0, 1.0),
+    'inv': _inv,
+    'log': lambda z: np.log(np.maximum(1e-7, z)),
+    'exp': lambda z: np.exp(_clip(z, -60.0, 60.0)),
+    'abs': np.abs,
+    'hat': lambda z: np.maximum(0.0, 1 - np.abs(z)),
+    'square': lambda z: z ** 2,
+    'cube': lambda z: z ** 3,
+}
+
+
+class BatchNetwork:
+    """
+    All networks of one generation as padded arrays.
+
+    Slots 0..num_inputs-1 of each row hold the inputs, the next num_outputs slots hold the
+    outputs, and hidden nodes follow. weights[g, dst, src] is the connection weight into
+    slot dst, and depth[g, slot] is the layer in which the node is evaluated (-1 for
+    inputs and nodes the network never evaluates).
+    Genomes that use an aggregation other than sum, or an activation with no NumPy
+    version, keep a regular FeedForwardNetwork and are evaluated one by one.
+    """
+    def __init__(self, weights, bias, response, depth, activation, names, num_inputs, num_outputs, fallbacks):
+        self.weights = weights
+        self.bias = bias
+        self.response = response
+        self.depth = depth
+        self.activation = activation
+        self.names = names
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+        self.fallbacks = fallbacks
+        layers = int(depth.max()) + 1 if depth.size else 0
+        codes = np.unique(activation[depth >= 0])
+        # (layer mask, [(activation function, node mask), ...]) for each layer, built once
+        self.steps = []
+        for d in range(layers):
+            layer = depth == d
+            self.steps.append((layer, [(activations[names[code]], layer & (activation == code))
+                                       for code in codes if (layer & (activation == code)).any()]))
+
+    @staticmethod
+    def create(genomes, config):
+        """
+        Receives a list of genomes and returns one BatchNetwork for all of them.
+        """
+        genome_config = config.genome_config
+        input_keys = genome_config.input_keys
+        output_keys = genome_config.output_keys
+        num_inputs, num_outputs = len(input_keys), len(output_keys)
+        names = sorted(activations)
+
+        compiled = []
+        fallbacks = {}
+        for g, genome in enumerate(genomes):
+            connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+            layers = feed_forward_layers(input_keys, output_keys, connections)
+            nodes = [genome.nodes[node] for layer in layers for node in layer]
+            if any(ng.aggregation != 'sum' or ng.activation not in activations for ng in nodes):
+                fallbacks[g] = neat.nn.FeedForwardNetwork.create(genome, config)
+            compiled.append((layers, connections))
+
+        hidden = [sum(1 for layer in layers for node in layer if node not in output_keys) for layers, _ in compiled]
+        size = num_inputs + num_outputs + max(hidden, default=0)
+        n = len(genomes)
+        weights = np.zeros((n, size, size))
+        bias = np.zeros((n, size))
+        response = np.zeros((n, size))
+        depth = np.full((n, size), -1, dtype=np.int64)
+        activation = np.zeros((n, size), dtype=np.int64)
+
+        for g, (genome, (layers, connections)) in enumerate(zip(genomes, compiled)):
+            if g in fallbacks:
+                continue
+            slots = {key: i for i, key in enumerate(input_keys)}
+            slots.update({key: num_inputs + i for i, key in enumerate(output_keys)})
+            for d, layer in enumerate(layers):
+                for node in layer:
+                    slot = slots.setdefault(node, len(slots))
+                    ng = genome.nodes[node]
+                    bias[g, slot] = ng.bias
+                    response[g, slot] = ng.response
+                    depth[g, slot] = d
+                    activation[g, slot] = names.index(ng.activation)
+            for inode, onode in connections:
+                if inode in slots and onode in slots:
+                    weights[g, slots[onode], slots[inode]] = genome.connections[(inode, onode)].weight
+
+        return BatchNetwork(weights, bias, response, depth, activation, names, num_inputs, num_outputs, fallbacks)
+
+    def activate(self, inputs):
+        """
+        :param inputs: (..., n, num_inputs) array, one row per network. Leading dimensions
+                       evaluate the same networks on several batches of inputs at once.
+        :return: (..., n, num_outputs) array of output values
+        """
+        inputs = np.asarray(inputs, dtype=float)
+        values = np.zeros(inputs.shape[:-1] + self.bias.shape[-1:])
+        values[..., :self.num_inputs] = inputs
+        for layer, functions in self.steps:
+            z = self.bias + self.response * np.matmul(self.weights, values[..., None])[..., 0]
+            for function, mask in functions:
+                values[..., mask] = function(z[..., mask])
+        outputs = values[..., self.num_inputs:self.num_inputs + self.num_outputs]
+        for g, net in self.fallbacks.items():
+            rows = inputs[..., g, :].reshape(-1, self.num_inputs)
+            outputs[..., g, :] = np.array([net.activate(row) for row in rows.tolist()]).reshape(outputs[..., g, :].shape)
+        return outputs
+
+    def decide(self, inputs):
+        """
+        Index of the largest output for every network, the batched form of output.index(max(output)).
+        """
+        return np.argmax(self.activate(inputs), axis=-1)
@@ -0,0 +1,306 @@
+"""
+Benchmarks for the diver physics, collision, network activation and whole generations.
+
+Runs headless, with SDL's dummy video driver when no display is set. Results are
+printed as a table and can be saved as JSON, then compared against a saved baseline:
+
+    python benchmark.py --save baseline.json
+    python benchmark.py --baseline baseline.json
+
+The exit code is 1 when any benchmark got slower than the baseline by more than the
+tolerance, so a regression fails the command.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import neat
+import numpy as np
+
+import sim
+import population
+import batchnet
+import assets
+import drawables
+import diving
+
+
+FORMAT_VERSION = 1
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(LOCAL_DIR, 'config_feedforward.txt')
+FLIP_REQUIREMENT = 2.0
+SEED = 1
+
+
+def load_config():
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation, CONFIG_PATH)
+
+
+def make_genomes(config, n, seed=SEED):
+    """
+    :return: list of (key, genome) for `n` fresh genomes, the same for a given seed
+    """
+    random.seed(seed)
+    genomes = []
+    for key in range(1, n + 1):
+        genome = config.genome_type(key)
+        genome.configure_new(config.genome_config)
+        genomes.append((key, genome))
+    return genomes
+
+
+def trajectory(params=sim.TRAINING_PARAMS):
+    """
+    :return: list of (state, position, base y) for every tick of one dive that tucks half way down
+    """
+    dive = sim.DiveSim(params)
+    frames = []
+    while not dive.landed:
+        dive.step(0 if dive.ticks % 40 < 20 else 1)
+        frames.append((dive.diver.state, dive.diver.position, dive.base.y))
+    return frames
+
+
+def bench_update_rotate():
+    """
+    One diver's jump, update, rotate and update2 for a whole dive, without collision.
+    """
+    diver = sim.Diver(sim.TRAINING_PARAMS.start_position, sim.TRAINING_PARAMS)
+
+    def run():
+        diver.position = diver.original_position
+        diver.state = 'standing'
+        diver.angle = 0
+        for tick in range(100):
+            diver.jump()
+            if tick == 20:
+                diver.tuck()
+            diver.update(True)
+            diver.rotate()
+            diver.update2()
+    return run, 100
+
+
+def bench_collide():
+    """
+    sim.Base.collide over every tick of a recorded dive.
+    """
+    frames = trajectory()
+    base = sim.Base(sim.TRAINING_PARAMS)
+    diver = sim.Diver(sim.TRAINING_PARAMS.start_position, sim.TRAINING_PARAMS)
+
+    def run():
+        diver.previous_offset = None
+        for state, position, base_y in frames:
+            diver.state, diver.position, base.y = state, position, base_y
+            base.collide(diver)
+    return run, len(frames)
+
+
+def bench_collide_masks():
+    """
+    drawables.Base.collide, the pygame mask version used when watching, over the same dive.
+    """
+    frames = trajectory()
+    base = drawables.Base(assets.base_images(), sim.TRAINING_PARAMS)
+    diver = drawables.Character({'standing': 'imgs/Standing.png', 'straight': 'imgs/Entry2.png',
+                                 'tuck': 'imgs/Tuck.png'}, sim.TRAINING_PARAMS.start_position,
+                                sim.TRAINING_PARAMS)
+
+    def run():
+        diver.previous_offset = None
+        for state, position, base_y in frames:
+            diver.state, diver.position, base.y = state, position, base_y
+            base.collide(diver)
+    return run, len(frames)
+
+
+def bench_collide_population(n=2000):
+    """
+    population.ContactTable.collide for `n` divers at once, one call per tick of a recorded dive.
+    """
+    frames = trajectory()
+    contacts = population.ContactTable(sim.load_shapes())
+    rng = np.random.default_rng(SEED)
+    jitter = rng.integers(-20, 20, n)
+    ticks = []
+    previous = None
+    for state, position, base_y in frames:
+        states = np.full(n, population.STATES.index(state), dtype=np.int8)
+        ox = (sim.BASE_OFFSET[0] - position[0] + jitter).astype(np.int64)
+        oy = np.full(n, int(base_y - position[1] + sim.BASE_OFFSET[1]), dtype=np.int64)
+        ticks.append((states, ox, oy if previous is None else previous, oy))
+        previous = oy
+
+    def run():
+        for states, ox, first, last in ticks:
+            contacts.collide(states, ox, first, last)
+    return run, len(ticks)
+
+
+def bench_activate(config):
+    """
+    neat.nn.FeedForwardNetwork.activate on one network, as in watch mode.
+    """
+    _, genome = make_genomes(config, 1)[0]
+    net = neat.nn.FeedForwardNetwork.create(genome, config)
+
+    def run():
+        for tick in range(100):
+            net.activate([720, tick * 10, -tick * 5])
+    return run, 100
+
+
+def bench_activate_batch(config, n=2000):
+    """
+    batchnet.BatchNetwork.decide for `n` networks at once, as in headless training.
+    """
+    nets = batchnet.BatchNetwork.create([g for _, g in make_genomes(config, n)], config)
+    inputs = np.random.default_rng(SEED).normal(0, 300, (n, 3))
+
+    def run():
+        nets.decide(inputs)
+    return run, 1
+
+
+def bench_generation(config, n):
+    """
+    One headless diving.evaluate of `n` genomes, with no fitness cache.
+    """
+    genomes = make_genomes(config, n)
+
+    def run():
+        for _, genome in genomes:
+            genome.fitness = None
+        diving.evaluate(genomes, config, FLIP_REQUIREMENT)
+    return run, 1
+
+
+def benchmarks(config):
+    """
+    :return: dict of name -> function building (callable, operations per call)
+    """
+    return {
+        'update_rotate': bench_update_rotate,
+        'collide': bench_collide,
+        'collide_masks': bench_collide_masks,
+        'collide_population_2000': bench_collide_population,
+        'activate': lambda: bench_activate(config),
+        'activate_batch_2000': lambda: bench_activate_batch(config),
+        'generation_20': lambda: bench_generation(config, 20),
+        'generation_200': lambda: bench_generation(config, 200),
+        'generation_2000': lambda: bench_generation(config, 2000),
+    }
+
+
+def measure(run, operations, repeat=5, min_time=0.2):
+    """
+    Time `run` in batches of calls long enough to be measured, `repeat` times.
+    :return: dict of seconds per operation: median and fastest batch
+    """
+    run()  # Warm up caches and lazy loading
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or calls >= 1 << 20:
+            break
+        calls *= 2
+    times = [elapsed / calls]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            run()
+        times.append((time.perf_counter() - start) / calls)
+    return {
+        'median': statistics.median(times) / operations,
+        'min': min(times) / operations,
+        'operations': operations,
+        'calls': calls,
+        'repeat': repeat,
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    :return: list of (name, baseline seconds, current seconds, ratio, regressed) for the
+             benchmarks found in both runs, judged on the fastest batch, which is the least noisy
+    """
+    rows = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        ratio = result['min'] / old['min'] if old['min'] else float('inf')
+        rows.append((name, old['min'], result['min'], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the cliff diving simulation")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all of them when empty")
+    parser.add_argument("--repeat", type=int, default=5, help="timed batches per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds each timed batch should last at least")
+    parser.add_argument("--save", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="JSON file from --save to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="slowdown over the baseline reported as a regression")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    available = benchmarks(config)
+    if args.list:
+        for name in available:
+            print(name)
+        return 0
+    unknown = [name for name in args.names if name not in available]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = {}
+    for name in args.names or available:
+        run, operations = available[name]()
+        results[name] = measure(run, operations, args.repeat, args.min_time)
+        print(f"{name:<26} {results[name]['median'] * 1e6:12.2f} us/op  (min {results[name]['min'] * 1e6:.2f})")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'environment': environment(), 'results': results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('version') != FORMAT_VERSION:
+            print(f"{args.baseline} is benchmark format {baseline.get('version')}, expected {FORMAT_VERSION}")
+            return 2
+        rows = compare(results, baseline['results'], args.tolerance)
+        print()
+        for name, old, new, ratio, regressed in rows:
+            print(f"{name:<26} {old * 1e6:12.2f} -> {new * 1e6:12.2f} us/op  {ratio:6.2f}x{'  REGRESSION' if regressed else ''}")
+        if any(regressed for *_, regressed in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Checkpoints for training runs, written on a background thread.
+
+Each checkpoint is one gzip-compressed pickle holding the population, species, the
+StatisticsReporter, the random module's state and the fitness cache entries of the
+saved population, tagged with a format version. Entries of extinct genomes are left out,
+they cannot hit again after a resume; use diving.py --cache to keep the whole cache. Only the newest `keep` checkpoints are kept on disk.
+"""
+import copy
+import glob
+import gzip
+import itertools
+import os
+import pickle
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import neat
+
+
+FORMAT_VERSION = 1
+FILE_PATTERN = 'neat-checkpoint-{0}.pkl.gz'
+
+
+class Checkpointer(neat.reporting.BaseReporter):
+    """
+    Reporter that snapshots the run at the end of every `interval` generations.
+
+    The snapshot is pickled on the training thread, so it matches the generation exactly.
+    Compressing and writing it happens on a single background thread, so the next
+    generation starts right away.
+    """
+    def __init__(self, directory='checkpoints', interval=1, keep=3, stats=None, cache=None):
+        """
+        :param directory: str, where checkpoint files are written
+        :param interval: int, generations between checkpoints
+        :param keep: int, newest checkpoints kept on disk, older ones are deleted
+        :param stats: neat.StatisticsReporter saved with the population
+        :param cache: fitness_cache.FitnessCache, its entries for the population are saved with it
+        """
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.stats = stats
+        self.cache = cache
+        self.generation = None
+        self.writer = ThreadPoolExecutor(1)
+        self.pending = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def end_generation(self, config, population, species_set):
+        if (self.generation + 1) % self.interval:
+            return
+        # The species set points at the live reporters, this one included, which are not saved
+        species_set = copy.copy(species_set)
+        species_set.reporters = None
+        state = {
+            'version': FORMAT_VERSION,
+            'generation': self.generation + 1,  # The population passed in is the next generation's
+            'config': config,
+            'population': population,
+            'species_set': species_set,
+            'stats': self.stats,
+            'rng': random.getstate(),
+            'cache': self.cache.entries_for(population.values()) if self.cache is not None else None,
+        }
+        data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        path = os.path.join(self.directory, FILE_PATTERN.format(self.generation + 1))
+        if self.pending is not None:
+            # At most one write in flight, and a failed write stops the run
+            self.pending.result()
+        self.pending = self.writer.submit(self._write, path, data)
+
+    def _write(self, path, data):
+        with gzip.open(path + '.tmp', 'wb', compresslevel=5) as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        for old in checkpoints(self.directory)[:-self.keep]:
+            os.remove(old)
+
+    def close(self):
+        """
+        Wait for the last checkpoint to reach the disk.
+        """
+        self.writer.shutdown(wait=True)
+        if self.pending is not None:
+            self.pending.result()
+
+
+def checkpoints(directory):
+    """
+    :return: list of checkpoint paths in `directory`, oldest generation first
+    """
+    paths = glob.glob(os.path.join(directory, FILE_PATTERN.format('*')))
+    return sorted(paths, key=lambda path: int(re.search(r'(\d+)\.pkl\.gz$', path).group(1)))
+
+
+def restore(path, cache=None):
+    """
+    Load a checkpoint and put the run back the way it was.
+    :param path: str, a checkpoint file, or a directory to resume from its newest checkpoint
+    :param cache: fitness_cache.FitnessCache to refill with the saved entries
+    :return: (neat.Population, neat.StatisticsReporter or None)
+    """
+    if os.path.isdir(path):
+        found = checkpoints(path)
+        if not found:
+            raise FileNotFoundError(f"No checkpoints in {path}")
+        path = found[-1]
+    with gzip.open(path, 'rb') as f:
+        state = pickle.load(f)
+    if state.get('version') != FORMAT_VERSION:
+        raise ValueError(f"{path} is checkpoint format {state.get('version')}, expected {FORMAT_VERSION}")
+
+    random.setstate(state['rng'])
+    if cache is not None and state['cache']:
+        for key, result in state['cache']:
+            cache.put(key, result)
+    population = neat.Population(state['config'], (state['population'], state['species_set'], state['generation']))
+    population.species.reporters = population.reporters
+    # New genomes must not reuse the keys of the restored ones
+    population.reproduction.genome_indexer = itertools.count(max(state['population']) + 1)
+    return population, state['stats']
@@ -0,0 +1,335 @@
+"""
+Genome evaluation spread over any number of machines through a work queue.
+
+A broker holds the queue. The coordinator, diving.run, cuts each generation into batches
+of genomes and pushes them to the broker together with the config and the scenarios.
+Workers, on the same machine or on other hosts, take batches, dive them with
+diving.episodes and hand back the results. A worker keeps nothing between batches, so
+any worker can run any batch. A batch nobody finished in time goes back on the queue
+for another worker. When it is finished twice, the second result is dropped; both
+results are the same because the episodes are deterministic.
+
+The broker is a multiprocessing manager server reached over TCP. Everything that
+connects to it must know its key, given with --authkey or the CLIFF_DIVER_AUTHKEY
+environment variable:
+
+    export CLIFF_DIVER_AUTHKEY=<long random secret>
+    python distributed.py broker --bind 10.0.0.5:7000
+    python distributed.py worker --connect 10.0.0.5:7000   (once per core, on any host)
+    python diving.py --broker 10.0.0.5:7000
+
+Workers unpickle whatever the broker hands them, so anyone holding the key can run code
+on every worker. Only expose the broker on a trusted network, and keep the key secret.
+The broker listens on 127.0.0.1 unless told otherwise.
+
+With `--broker local` diving.run starts the broker and --workers worker processes on
+this machine instead, with a fresh random key, which is handy for testing.
+"""
+import argparse
+import collections
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+import traceback
+import uuid
+from multiprocessing.managers import BaseManager
+
+
+AUTHKEY_VARIABLE = 'CLIFF_DIVER_AUTHKEY'
+LOCAL = 'local'  # Broker address that stands for a broker and workers on this machine
+
+
+class Broker:
+    """
+    The queue itself. Batches are opaque bytes here, so the broker needs neither neat nor
+    pygame and can run anywhere.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = collections.deque()
+        self.running = {}  # job id -> (payload, timeout, deadline)
+        self.results = {}
+        self.collected = set()  # Job ids already handed back, so late duplicates are dropped
+        self.requeued = 0
+        self.closed = False
+
+    def submit(self, jobs, timeout):
+        """
+        :param jobs: list of (job id, payload bytes)
+        :param timeout: float, seconds a worker gets to finish a job before it is handed to another
+        """
+        with self.lock:
+            self.pending.extend((job, payload, timeout) for job, payload in jobs)
+
+    def fetch(self):
+        """
+        :return: (job id, payload bytes) of the oldest waiting job, None when there is none
+        """
+        with self.lock:
+            now = time.monotonic()
+            for job, (payload, timeout, deadline) in list(self.running.items()):
+                if deadline < now:
+                    del self.running[job]
+                    self.pending.append((job, payload, timeout))
+                    self.requeued += 1
+            if not self.pending:
+                return None
+            job, payload, timeout = self.pending.popleft()
+            self.running[job] = (payload, timeout, now + timeout)
+            return job, payload
+
+    def complete(self, job, result):
+        """
+        :param result: bytes, kept only for the first worker to finish the job
+        """
+        with self.lock:
+            if self.running.pop(job, None) is None:
+                # A slow worker finishing a job that was requeued, the copy need not run again
+                self.pending = collections.deque(entry for entry in self.pending if entry[0] != job)
+            if job not in self.collected:
+                self.results.setdefault(job, result)
+
+    def collect(self, jobs):
+        """
+        :param jobs: list of job ids
+        :return: dict of job id -> result bytes for those of `jobs` that are finished, which
+                 are removed from the broker
+        """
+        with self.lock:
+            finished = {job: self.results.pop(job) for job in jobs if job in self.results}
+            self.collected.update(finished)
+            return finished
+
+    def status(self):
+        with self.lock:
+            return {'pending': len(self.pending), 'running': len(self.running),
+                    'finished': len(self.results), 'requeued': self.requeued, 'closed': self.closed}
+
+    def close(self):
+        """
+        Tell the workers to stop.
+        """
+        with self.lock:
+            self.closed = True
+
+    def is_closed(self):
+        return self.closed
+
+
+_broker = None
+
+
+def _shared_broker():
+    global _broker
+    if _broker is None:
+        _broker = Broker()
+    return _broker
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+BrokerManager.register('broker', callable=_shared_broker)
+
+
+def parse_address(address):
+    """
+    :param address: str, "host:port"
+    :return: (host, port)
+    """
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def shared_key(authkey=None):
+    """
+    :param authkey: str or bytes, the broker's key, read from the CLIFF_DIVER_AUTHKEY environment variable when None
+    :return: bytes
+    """
+    authkey = authkey or os.environ.get(AUTHKEY_VARIABLE)
+    if not authkey:
+        raise ValueError(f"The broker needs a key: pass --authkey or set {AUTHKEY_VARIABLE}")
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def serve(address, authkey):
+    """
+    Run a broker in this process until it is killed.
+    :param address: (host, port) to listen on
+    """
+    manager = BrokerManager(address, authkey)
+    server = manager.get_server()
+    print(f"Broker listening on {server.address[0]}:{server.address[1]}")
+    server.serve_forever()
+
+
+def start_local(authkey):
+    """
+    Start a broker in a child process, listening on a free port of this machine.
+    :return: started BrokerManager, its address is manager.address
+    """
+    manager = BrokerManager(('127.0.0.1', 0), authkey)
+    manager.start()
+    return manager
+
+
+def connect(address, authkey):
+    """
+    :param address: (host, port) of a broker
+    :return: proxy of its Broker
+    """
+    manager = BrokerManager(address, authkey)
+    manager.connect()
+    return manager.broker()
+
+
+def work(address, authkey, poll=0.05, retry=5.0):
+    """
+    Worker loop: take a batch, dive it, send back the result, until the broker closes or
+    goes away. A batch that raises is sent back as the traceback, for the coordinator to raise.
+    :param poll: float, seconds to wait before asking again when the queue is empty
+    :param retry: float, seconds to keep trying to reach a broker that is not up yet
+    """
+    import diving
+
+    give_up = time.monotonic() + retry
+    while True:
+        try:
+            broker = connect(address, authkey)
+            break
+        except ConnectionError:
+            if time.monotonic() > give_up:
+                raise
+            time.sleep(0.2)
+    try:
+        while not broker.is_closed():
+            fetched = broker.fetch()
+            if fetched is None:
+                time.sleep(poll)
+                continue
+            job, payload = fetched
+            try:
+                config, genomes, scenarios = pickle.loads(payload)
+                result = (True, diving.episodes(genomes, config, scenarios))
+            except Exception:
+                result = (False, traceback.format_exc())
+            broker.complete(job, pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+    except (EOFError, ConnectionError):
+        pass  # The broker went away
+
+
+class DistributedEvaluator:
+    """
+    Drop-in fitness function for Population.run that evaluates each generation through a
+    broker, like parallel.ParallelEvaluator does through a process pool.
+    """
+    def __init__(self, address=LOCAL, workers=0, scenarios=None, cache=None, batch_size=32,
+                 timeout=60.0, deadline=600.0, authkey=None, poll=0.01):
+        """
+        :param address: str, "host:port" of a running broker, or LOCAL to start a broker and
+                        `workers` worker processes on this machine
+        :param workers: int, local worker processes, 0 for one per CPU. Ignored for a remote broker.
+        :param scenarios: list of flip requirements, see diving.evaluate
+        :param cache: fitness_cache.FitnessCache kept in this process, only misses reach the workers
+        :param batch_size: int, genomes per job. Larger batches mean fewer round trips and
+                           better vectorized episodes, smaller ones spread better over workers.
+        :param timeout: float, seconds before an unfinished job is handed to another worker
+        :param deadline: float, seconds a generation may take before it fails, so a broker
+                         without live workers cannot hang the run
+        :param authkey: str or bytes, key of a remote broker, see shared_key. A local broker gets a random one.
+        :param poll: float, seconds between checks for finished jobs
+        """
+        self.scenarios = scenarios
+        self.cache = cache
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.deadline = deadline
+        self.poll = poll
+        self.manager = None
+        self.processes = []
+        if address == LOCAL:
+            authkey = os.urandom(32)
+            self.manager = start_local(authkey)
+            self.address = self.manager.address
+            context = multiprocessing.get_context('spawn')
+            for _ in range(workers or os.cpu_count()):
+                process = context.Process(target=work, args=(self.address, authkey), daemon=True)
+                process.start()
+                self.processes.append(process)
+        else:
+            authkey = shared_key(authkey)
+            self.address = parse_address(address)
+        self.broker = connect(self.address, authkey)
+        self.prefix = uuid.uuid4().hex[:8]  # Keeps job ids apart when several coordinators share a broker
+        self.counter = itertools.count()
+
+    def episodes(self, genomes, config, scenarios):
+        """
+        Same as diving.episodes, run as jobs of batch_size genomes on whichever workers are up.
+        Raises the first error a worker sends back, and TimeoutError past the deadline.
+        """
+        jobs = []
+        for i in range(0, len(genomes), self.batch_size):
+            job = f"{self.prefix}-{next(self.counter)}"
+            payload = pickle.dumps((config, genomes[i:i + self.batch_size], scenarios), pickle.HIGHEST_PROTOCOL)
+            jobs.append((job, payload))
+        self.broker.submit(jobs, self.timeout)
+
+        results = {}
+        waiting = [job for job, _ in jobs]
+        give_up = time.monotonic() + self.deadline
+        while waiting:
+            for job, result in self.broker.collect(waiting).items():
+                ok, results[job] = pickle.loads(result)
+                if not ok:
+                    raise RuntimeError(f"Job {job} failed on a worker:\n{results[job]}")
+            waiting = [job for job in waiting if job not in results]
+            if waiting:
+                if self.processes and not any(process.is_alive() for process in self.processes):
+                    raise RuntimeError("Every local worker has stopped")
+                if time.monotonic() > give_up:
+                    raise TimeoutError(f"{len(waiting)} of {len(jobs)} jobs unfinished after {self.deadline:g} sec, "
+                                       f"broker: {self.broker.status()}")
+                time.sleep(self.poll)
+        return [result for job, _ in jobs for result in results[job]]
+
+    def evaluate(self, genomes, config):
+        import diving
+        diving.evaluate(genomes, config, scenarios=self.scenarios, cache=self.cache, run_episodes=self.episodes)
+
+    def close(self):
+        """
+        Stop the local broker and workers. A remote broker and its workers keep running.
+        """
+        if self.manager is not None:
+            self.broker.close()
+            for process in self.processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+            self.manager.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Broker and workers for distributed evaluation")
+    parser.add_argument("role", choices=("broker", "worker", "status"))
+    parser.add_argument("--bind", default="127.0.0.1:7000",
+                        help="address the broker listens on, only ever on a trusted network")
+    parser.add_argument("--connect", default="127.0.0.1:7000", help="broker address for workers and status")
+    parser.add_argument("--authkey", default=None,
+                        help=f"key shared by the broker, workers and coordinator, ${AUTHKEY_VARIABLE} by default")
+    args = parser.parse_args()
+    try:
+        authkey = shared_key(args.authkey)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.role == 'broker':
+        serve(parse_address(args.bind), authkey)
+    elif args.role == 'worker':
+        work(parse_address(args.connect), authkey)
+    else:
+        print(connect(parse_address(args.connect), authkey).status())
@@ -1,264 +1,166 @@
 import pygame
 import sys
 import random
+import sim
+import masks
+import assets
+import render
+import population
+import batchnet
+import parallel
+import distributed
+import fitness_cache
+import checkpoint
+import metrics
+import replay
+import scoring
+import spectator
+import numpy as np
 import neat
 import os
+import argparse
+import functools
+from drawables import Character, Cliff, Base, cliff_images
 
 
-cliff_images = {
-        'top': 'imgs/Cliff1.png',
-        'middle': 'imgs/Cliff3.png'
-    }
-class Character:
-    def __init__(self, image_paths, position):
-        self.images = {state: pygame.image.load(path).convert_alpha() for state, path in image_paths.items()}
-        self.original_position = position
-        self.position = position
-        self.state = 'standing'
-        self.velocity = 20  # Increased jump velocity for more noticeable effect
-        self.angle = 0  # Initial angle of rotation
-        self.total_flips = 0
-
-
-
-    def draw(self, screen, collide):
-        if not collide:
-            rotated_image = pygame.transform.rotate(self.images[self.state], -self.angle)
-            # Correct the position offset caused by rotation
-            new_rect = rotated_image.get_rect(center=self.images[self.state].get_rect(topleft=self.position).center)
-            screen.blit(rotated_image, new_rect.topleft)
-
-
-    def jump(self):
-        if self.state == 'standing':  # Ensure jump only from standing
-            self.state = 'straight'  # Change the state to 'jumping'
-            self.velocity_x = 2  # Horizontal velocity to move forward
-            self.velocity_y = -10  # Initial upward velocity for the jump
-
-    def tuck(self):
-        if self.state == 'straight':  # Ensure tuck only if in straight
-            self.state = 'tuck'
-
-    def release_tuck(self):
-        if self.state == 'tuck':  # Ensure we go back to straight only if we were tucking
-            self.state = 'straight'
-
-    def update(self, jump):
-        if jump and self.position[1] < 41:
-            # Apply horizontal and vertical velocities to position
-            self.position = (self.position[0] + self.velocity_x, self.position[1] + self.velocity_y)
-            # Apply gravity to vertical velocity
-            self.velocity_y += 0.5
-            if self.position[0] < 50:
-                self.velocity_x += 0.5 # Gravity effect, incrementally reducing upward velocity
-      
-
-        
-
-    def finalize_flip_count(self):
-        # Calculate total half flips based purely on rotation
-        self.total_flips = round(abs(self.angle) / 180)
-        if self.total_flips % 2 == 0:
-            self.total_flips /= 2
-        else:
-            self.total_flips -= 1
-            self.total_flips /= 2
-            self.total_flips += 0.5
-
-
-
-
-    def update2(self):
-        # Automatically apply gravity if not standing
-        if self.state != 'standing':
-            self.position = (self.position[0], self.position[1] + 20)
-        # Reset to standing position if diver goes below original position
-
-
-    def rotate(self):
-        if self.state == 'straight':
-            self.angle += 0.6  # Slow rotation in straight position
-        elif self.state == 'tuck':
-            self.angle += 30  # Fast rotation in tuck position
-        # Ensure the angle wraps around 360 degrees
-        # self.angle %= 360
-
-    def get_mask(self):
-        """
-        gets the mask for the current image of the bird
-        :return: None
-        """
-        return pygame.mask.from_surface(self.images[self.state])
-
-
-
-
-
-class Cliff:
+def handle(divers, ge, hits, total_angle, tick, score=scoring.default):
     """
-    Represents the scrolling cliffs of the game, moving vertically upward.
+    Score the divers that hit the water this tick. A diver only hits once, so each one is scored once.
+    :param tick: int, the tick the divers hit the water
+    :param score: fitness function from scoring, called once for all the hits
     """
-    VEL = 0.7  # Speed at which the cliff scrolls upwards
-
-    def __init__(self, image_paths, x, screen_height):
-        """
-        Initialize the cliff sections.
-        :param image_paths: dictionary of paths to cliff images (top, middle)
-        :param x: int, horizontal position to start drawing cliffs
-        :param screen_height: int, the height of the game screen
-        """
-        self.images = {part: pygame.image.load(path).convert_alpha() for part, path in image_paths.items()}
-        self.x = x
-        self.y2 = self.images['top'].get_height()
-        self.screen_height = screen_height
-        self.y = 70  # Start the cliffs just off the bottom of the screen
-        self.current_section = 'top'
-        self.middle_fixed = False  # Control if the middle section is fixed
-        self.moving = False
-        self.y2 = 0
-
-    def move(self):
-        """
-        Move the cliff images upward by decreasing the y position.
-
-        """
-
-        if not self.middle_fixed and self.moving:
-            self.y -= self.VEL
-            
-
-            # Check if we need to switch from the top to the middle section
-            if self.current_section == 'top' and self.y + self.images['top'].get_height() < self.screen_height:
-                self.current_section = 'middle'
-                # Set the middle cliff to start exactly at the point where the top cliff ends
-                # The y-coordinate is set to the point where the top cliff ends
-                self.y = 0
-                
-
-            # Fix the middle section in place when it reaches the bottom of the screen
-            if self.current_section == 'middle' and self.y < self.screen_height - self.images['middle'].get_height():
-                self.middle_fixed = True
-                self.y = self.screen_height - self.images['middle'].get_height()
-               
-               
-
-    def draw(self, win):
-        """
-        Draw the cliff section to the game window.
-        """
-        win.blit(self.images[self.current_section], (self.x, self.y))
-
-    def start_moving(self):
-        """
-        Start the cliff moving upward.
-        """
-        self.moving = True
-    
-class Base(Cliff):
-    Vel = 0.8
-    def __init__(self, imgs):
-        self.imgs = imgs
-        self.height = self.imgs[0].get_height()
-        self.y = 1550 - self.height
-
-
-    def move(self, fixed, curr_section):
-
-        if fixed or curr_section == 'standing':
-            return
-        else:
-            self.y -= self.Vel
-
-    def draw(self, win):
-        win.blit(self.imgs[0], (0, self.y))
-
-
-
-    def collide(self, diver):
-        """Check for collision between the base and the diver using masks."""
-        # Get the mask from the diver's image
-        diver_mask = diver.get_mask()
-
-        # Create a mask for the base image
-        base_mask = pygame.mask.from_surface(self.imgs[0])
-
-        # Calculate offset between the diver and the base
-        offset = (100 - diver.position[0], self.y - diver.position[1] + 130)  # Assumes diver has x and y attributes
-
-        # Check for collision at the offset
-        point_of_collision = diver_mask.overlap(base_mask, offset)
-        
-        # Return True if collision detected, False otherwise
-        return point_of_collision is not None
-    
-    def animate_splash(self, angle, win, bg_color, cliff):
-        angle %= 360
-    # Assuming angle divisions are meant to control the intensity of the splash
-        if 0 <= angle < 5 or 355 < angle <= 360 or 175 < angle < 185:
-            num_frames = 2  # Minimal splash
-        elif 5 <= angle < 55 or 305 < angle <= 355 or 140 < angle < 175 or 185 <= angle < 220:
-            num_frames = 3  # Small splash
-        elif 55 <= angle < 80 or 285 < angle <= 305 or 100 < angle < 140 or 220 <= angle < 260:
-            num_frames = 4  # Medium splash
-        else:
-            num_frames = 5  # Large splash # Most frames for the most dramatic splash
-
-        for i in range(num_frames):
-            if i < len(self.imgs):  # Check to avoid index out of range
-                win.blit(self.imgs[i], (0, self.y))
-                pygame.display.update()
-                pygame.time.wait(100)  # Wait 100 ms between frames
-                if i == num_frames - 1:
-                    for j in range(num_frames - 1, -1, -1):
-                        if i < len(self.imgs):  # Check to avoid index out of range
-                            win.fill(bg_color)
-                            cliff.draw(win)
-                            win.blit(self.imgs[j], (0, self.y))
-                            pygame.display.update()
-                            pygame.time.wait(100)
-        
-
-
-
-
-
-def handle(divers, ge, cliff, base, screen, bg_color, collide, total_angle, landed, runn):
-    for x, diver in enumerate(divers):
-            if collide and not landed:
-                runn = False
-                angle_difference = abs(diver.angle - total_angle)
-                # base.animate_splash(diver.angle, screen, bg_color, cliff)
-                landed = True
-                diver.finalize_flip_count()
-                print(f"diver angleeeeeeeeeeeeee {diver.angle}")
-                print(diver.state)
-                if diver.state == 'Straight':
-                    ge[x].fitness += 0.1
-                else:
-                    ge[x].fitness -= 0.1
-                if angle_difference > 0 and angle_difference <= 90:
-                    ge[x].fitness += 1000 / angle_difference  # High reward for nearly perfect alignment
-                elif angle_difference > 90:
-                    ge[x].fitness += 100 / angle_difference  # High reward for nearly perfect alignment
-                else:
-                    ge[x].fitness += 200
-               
-    return runn
-
-            
-
+    if not hits:
+        return
+    for x in hits:
+        divers[x].finalize_flip_count()
+        metrics.recorder.log(f"diver angleeeeeeeeeeeeee {divers[x].angle}")
+        metrics.recorder.log(divers[x].state)
+    gains = score(np.array([divers[x].angle for x in hits]),
+                  np.array([population.STATES.index(divers[x].state) for x in hits]),
+                  np.full(len(hits), total_angle), np.full(len(hits), tick))
+    for x, gain in zip(hits, gains.tolist()):
+        ge[x].fitness += gain
+
+
+def fitness(genomes, config, render=False, scenarios=None, cache=None, splashes=False):
+    """
+    Evaluate one generation of genomes.
+    :param render: bool, open a window and draw every frame at 30 FPS. When False
+                   the whole population is stepped headless with no frame cap.
+    :param scenarios: list of flip requirements every genome is scored against in headless
+                      runs, one random flip requirement per generation when None
+    :param cache: fitness_cache.FitnessCache reused across generations in headless runs
+    :param splashes: bool, play the landing splashes when rendering
+    """
+    if render:
+        watch(genomes, config, splashes)
+    else:
+        evaluate(genomes, config, scenarios=scenarios, cache=cache)
 
 
+def sample_scenarios(count, seed=None):
+    """
+    :return: `count` flip requirements drawn without replacement, repeatable for a given seed
+    """
+    return sorted(random.Random(seed).sample(sim.flip_requirements, count))
 
-        
 
+def episodes(genomes, config, scenarios):
+    """
+    Dive every genome once per scenario, headless. population.PopulationSim steps every
+    diver at once and batchnet.BatchNetwork makes every decision in one call per tick.
+    Nothing here touches pygame or changes the genomes.
+    :param genomes: list of genomes
+    :param scenarios: list of flip requirements
+    :return: list of [mean reward, final angle per scenario] for each genome
+    """
+    nets = batchnet.BatchNetwork.create(genomes, config)
+    total_angles = [requirement * 360 for requirement in scenarios]
+    count, n = len(total_angles), len(genomes)
+
+    # Row s * n + x is genome x diving for scenario s
+    divers = population.PopulationSim(count * n)
+    targets = np.repeat(total_angles, n)
+    feed = spectator.feed
+    if feed is not None:
+        feed.start(genomes)
+    while not divers.landed.all():
+        timer = metrics.recorder.timer()
+        inputs = divers.observations(targets).reshape(count, n, -1)
+        decisions = nets.decide(inputs).reshape(-1)
+        timer.lap('activation')
+        divers.step(decisions)
+        if feed is not None:
+            feed.publish(divers, scenarios[0])  # Rows 0..n-1 dive the first scenario
+    metrics.recorder.count('ticks', divers.ticks)
+
+    timer = metrics.recorder.timer()
+    rewards = scoring.get(config)(divers.angle, divers.state, targets, divers.landing_tick).reshape(count, n)
+    total = 0
+    for s in range(count):
+        total = total + rewards[s]  # Summed in scenario order, as the per-diver loop did
+    angles = divers.angle.reshape(count, n)
+    results = [[gain, angles[:, x].tolist()] for x, gain in enumerate((total / count).tolist())]
+    timer.lap('scoring')
+    return results
+
+
+def evaluate(genomes, config, flip_requirement=None, scenarios=None, cache=None, run_episodes=episodes):
+    """
+    Headless evaluation: each genome gains its mean landing reward over the scenarios.
+    :param flip_requirement: float, number of flips to aim for, picked at random when None
+    :param scenarios: list of flip requirements. When given, each genome dives once per
+                      scenario in a single scenario x genome batch.
+    :param cache: fitness_cache.FitnessCache, genomes already seen with the same scenarios are not simulated again
+    :param run_episodes: function with the signature of episodes(), e.g. a worker pool's
+    """
+    ge = []
+    for _, g in genomes:
+        g.fitness = 0.001 if g.fitness is None else g.fitness
+        ge.append(g)
 
-def fitness(genomes, config):
+    if scenarios is None:
+        if flip_requirement is None:
+            flip_requirement = random.choice(sim.flip_requirements)
+        scenarios = [flip_requirement]
+
+    results = [None] * len(ge)
+    keys = [None] * len(ge)
+    if cache is not None:
+        for x, g in enumerate(ge):
+            keys[x] = fitness_cache.episode_key(g, scenarios, sim.TRAINING_PARAMS,
+                                                getattr(config, 'fitness_function', scoring.DEFAULT))
+            results[x] = cache.get(keys[x])
+    # The divers the spectator shows dive again even when cached, the result is the same
+    shown = spectator.feed.choose(ge) if spectator.feed is not None else set()
+    missing = [x for x, result in enumerate(results) if result is None or x in shown]
+    if missing:
+        metrics.recorder.count('episodes', len(missing) * len(scenarios))
+        for x, result in zip(missing, run_episodes([ge[x] for x in missing], config, scenarios)):
+            results[x] = result
+            if cache is not None:
+                cache.put(keys[x], result)
+
+    for g, (gain, angles) in zip(ge, results):
+        g.fitness += gain
+        metrics.recorder.log(f"angle wanted is {[requirement * 360 for requirement in scenarios]}\n\n")
+        metrics.recorder.log(f"TOTALLL ISSSS {angles}\n\n")
+        metrics.recorder.log(f"fitness is: {g.fitness}")
+    if cache is not None:
+        metrics.recorder.log(f"fitness cache: {cache}")
+
+
+def watch(genomes, config, splashes=False):
+    """
+    Evaluate one generation in a window at 30 FPS. Each tick the divers are stepped one
+    by one, then the shared cliff and water move once, so a tick costs O(N).
+    :param splashes: bool, play a splash on the water for each diver that lands
+    """
     nets = []
     ge = []
     divers = []
-    pygame.init()
-    screen = pygame.display.set_mode((800, 600))
+    screen = assets.screen((800, 600))
+    assets.preload()
     clock = pygame.time.Clock()
     bg_color = (135, 206, 235)  # Sky blue background
     pygame.display.set_caption("Stickman Cliff Diving")
@@ -271,31 +173,17 @@ def fitness(genomes, config):
     for _, g in genomes:
         net = neat.nn.FeedForwardNetwork.create(g, config)
         nets.append(net)
-        divers.append(Character(image_paths, (90, 40)))
+        divers.append(Character(image_paths, (90, 40), sim.TRAINING_PARAMS))
         g.fitness = 0.001 if g.fitness is None else g.fitness
         ge.append(g)
 
 
 
-    flip_requirement = random.choice([x * 0.5 for x in range(1, 10)])  # Generates numbers from 0.5 to 7.0 in steps of 0.5
+    flip_requirement = random.choice(sim.flip_requirements)
     total_angle = flip_requirement * 360
 
 
-    Base_images = []
-    
-    Base_images1 = [
-    pygame.image.load(f'imgs/Base{i}.png').convert_alpha() for i in range(0, 5)
-    ]
-   
-    for Base_image in Base_images1:
-        width = Base_image.get_width()
-        height = Base_image.get_height()
-
-        # Increase the height
-        new_height = height + 100
-        new_width = width + 450
-        Base_image = pygame.transform.scale(Base_image, (new_width, new_height))
-        Base_images.append(Base_image)
+    Base_images = assets.base_images()
         
 
 
@@ -303,91 +191,89 @@ def fitness(genomes, config):
     # Paths for images for different states
     
     
-    cliff = Cliff(cliff_images, 0, screen.get_height())
+    cliff = Cliff(cliff_images, 0, screen.get_height(), sim.TRAINING_PARAMS)
 
 
-    base = Base(Base_images)
+    base = Base(Base_images, sim.TRAINING_PARAMS)
     
 
-    running = True
-    runn = True
-    space_pressed = False
-    initial_press = True  # Flag to check if it's the first press of the space key
-    jump = False
+    renderer = render.DirtyRenderer(screen, bg_color)
 
+    landed = [False] * len(divers)
+    score = scoring.get(config)
+    tick = 0
 
-
-
-    font = pygame.font.Font(None, 36)
-
-    landed = False
-
-    while running:
+    while not all(landed):
         for event in pygame.event.get():
-     
+
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
+
+        # Agent phase: every diver still in the air decides, moves and checks for the water
+        timer = metrics.recorder.timer()
+        hits = []
         for x, diver in enumerate(divers):
+            if landed[x]:
+                continue
             diver.jump()
-            
-            jump = True
-    
-            
-
-
-
+            timer.lap('physics')
 
             inputs = [total_angle, diver.angle, (diver.position[1] - base.y)]
             output = nets[x].activate(inputs)
             decision = output.index(max(output))
+            timer.lap('activation')
             if decision == 0:
                 diver.tuck()
             if decision == 1:
                 diver.release_tuck()
-            
- 
-   
-            diver.update(jump)  # Update character state and position
-            diver.rotate()
-            collide = base.collide(diver)
-            cliff.start_moving()
-
-
-            cliff.move()
-            if cliff.middle_fixed:
-                diver.update2()
-            base.move(cliff.middle_fixed, diver.state)
-            runn = handle(divers, ge, cliff, base, screen, bg_color, collide, total_angle, landed, runn)
-
-            
-
-      
-        screen.fill(bg_color)
-        for diver in divers:
-            diver.draw(screen, collide)
-
-
-       
-
-
 
-        cliff.draw(screen)
-        base.draw(screen)
-        
-        text_surface = font.render(f"Flips: {flip_requirement}", True, (255, 255, 255))
-        screen.blit(text_surface, (400, 10))
-        
-        
-        pygame.display.update()
-        clock.tick(30)
-        if not runn:
-            break
-        
+            diver.update(True)  # Update character state and position
+            diver.rotate()
+            timer.lap('physics')
+            if base.collide(diver):
+                hits.append(x)
+            timer.lap('collision')
+
+        # World phase: the shared cliff and water move once per tick
+        cliff.start_moving()
+        cliff.move()
+        if cliff.middle_fixed:
+            for x, diver in enumerate(divers):
+                if not landed[x]:
+                    diver.update2()
+        base.move(cliff.middle_fixed, 'standing' if all(d.state == 'standing' for d in divers) else 'straight')
+        timer.lap('physics')
+
+        handle(divers, ge, hits, total_angle, tick, score)
+        tick += 1
+        for x in hits:
+            landed[x] = True
+        if splashes and hits:
+            base.start_splash(divers[hits[-1]].angle)  # The water is shared, the latest landing splashes
+        timer.lap('scoring')
+
+        # Only the parts of the window that changed since the last frame are redrawn
+        scene = []
+        for x, diver in enumerate(divers):
+            sprite = diver.sprite(landed[x])
+            if sprite is not None:
+                scene.append((('diver', x),) + sprite)
+        scene.append(('cliff',) + cliff.sprite())
+        scene.extend((('base', i),) + sprite for i, sprite in enumerate(base.sprites()))
+        scene.append(('text', assets.text(f"Flips: {flip_requirement}", 36, (255, 255, 255)), (400, 10)))
+        renderer.render(scene)
+        timer.lap('rendering')
+        metrics.recorder.count('ticks')
+        base.update_splash(clock.tick(30) / 1000)
+
+    metrics.recorder.count('episodes', len(divers))
     for x, diver in enumerate(divers):
-        print(f"angle wanted is {total_angle}\n\n")
-        print(f"TOTALLL ISSSS {diver.angle}\n\n")
-        print(f"fitness is: {ge[x].fitness}")
+        metrics.recorder.log(f"angle wanted is {total_angle}\n\n")
+        metrics.recorder.log(f"TOTALLL ISSSS {diver.angle}\n\n")
+        metrics.recorder.log(f"fitness is: {ge[x].fitness}")
+    metrics.recorder.log(f"collision mask cache: {masks.cache}")
+    metrics.recorder.log(f"rotation cache: {assets.rotations}")
        
     
 
@@ -406,23 +292,141 @@ def fitness(genomes, config):
 
 
 
-def run(config_path):
-    
+def run(config_path, render=False, workers=1, scenarios=None, cache_path=None, seed=None,
+        checkpoint_dir='checkpoints', resume=None, generations=100, profile=False, metrics_path=None,
+        verbose=False, replay_dir=None, replay_trace=False, splashes=False, spectate=0, spectate_mode='top',
+        broker=None, batch_size=32, job_timeout=60.0, generation_timeout=600.0):
+    """
+    Train the divers with NEAT.
+    :param config_path: str, path to the NEAT config file
+    :param render: bool, draw the divers while training (watch mode). Off by default
+                   so training runs headless and as fast as the machine allows.
+    :param workers: int, headless worker processes to spread each generation over, 0 for one per CPU
+    :param scenarios: list of flip requirements every genome is scored against each generation,
+                      one random flip requirement per generation when None
+    :param cache_path: str, JSON file the fitness cache is loaded from and saved to
+    :param seed: int, seeds the random module so the whole run can be repeated
+    :param checkpoint_dir: str, where a checkpoint is written after every generation, None to turn them off
+    :param resume: str, checkpoint file or directory to pick a run back up from
+    :param generations: int, total generations for the run, including any before a resume
+    :param profile: bool, time every phase of the loop and print a summary per generation
+    :param metrics_path: str, .jsonl or .csv file the per-generation timings are appended to, implies profile
+    :param verbose: bool, print every diver's landing angle and fitness
+    :param replay_dir: str, where a replay of each generation's best genome is saved, None to record none
+    :param replay_trace: bool, store the full state trace in each replay
+    :param splashes: bool, play the landing splashes in watch mode
+    :param spectate: int, divers to show live in a separate spectator window, 0 for none.
+                     Only for headless training in this process.
+    :param spectate_mode: 'top' to show the fittest genomes so far, 'sample' for a random subset
+    :param broker: str, "host:port" of a distributed.py broker to evaluate through, or "local" to
+                   start one with `workers` worker processes on this machine. None to evaluate here.
+                   A remote broker's key is read from the CLIFF_DIVER_AUTHKEY environment variable.
+    :param batch_size: int, genomes per job sent to the broker
+    :param job_timeout: float, seconds before a job a worker has not finished goes to another worker
+    :param generation_timeout: float, seconds a generation may wait on the broker before the run fails
+    :return: (best genome of the run, neat.StatisticsReporter)
+    """
+    if seed is not None:
+        random.seed(seed)
+
     config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
                          neat.DefaultSpeciesSet, neat.DefaultStagnation,
                          config_path)
-    # p = neat.Checkpointer.restore_checkpoint('neat-checkpoint-27')
+    config.fitness_function = scoring.configured(config_path)
+    cache = fitness_cache.FitnessCache(path=cache_path)
 
-    p = neat.Population(config)
+    if resume:
+        p, stats = checkpoint.restore(resume, cache)
+        p.config.fitness_function = config.fitness_function
+        stats = stats or neat.StatisticsReporter()
+    else:
+        p = neat.Population(config)
+        stats = neat.StatisticsReporter()
 
     p.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
     p.add_reporter(stats)
-    # p.add_reporter(neat.Checkpointer(1))
-
-    winner = p.run(fitness,100)
+    metrics.recorder.enabled = profile or bool(metrics_path)
+    metrics.recorder.verbose = verbose
+    sink = metrics.open_sink(metrics_path) if metrics_path else None
+    if metrics.recorder.enabled:
+        p.add_reporter(metrics.MetricsReporter(metrics.recorder, sink))
+    if spectate:
+        if render or workers != 1 or broker:
+            raise ValueError("Spectating needs headless training in a single process")
+        spectator.feed = spectator.Feed(spectate, spectate_mode)
+        spectator.feed.spawn()
+        p.add_reporter(spectator.feed)
+    if replay_dir:
+        p.add_reporter(replay.ReplayRecorder(scenarios or sim.flip_requirements, replay_dir, seed, trace=replay_trace))
+    checkpointer = None
+    if checkpoint_dir:
+        checkpointer = checkpoint.Checkpointer(checkpoint_dir, stats=stats, cache=cache)
+        p.add_reporter(checkpointer)
+
+    try:
+        if broker and not render:
+            evaluator = distributed.DistributedEvaluator(broker, workers, scenarios, cache, batch_size, job_timeout,
+                                                         generation_timeout)
+            try:
+                winner = p.run(evaluator.evaluate, generations - p.generation)
+            finally:
+                evaluator.close()
+        elif render or workers == 1:
+            winner = p.run(functools.partial(fitness, render=render, scenarios=scenarios, cache=cache,
+                                             splashes=splashes),
+                           generations - p.generation)
+        else:
+            evaluator = parallel.ParallelEvaluator(workers, config, scenarios, cache)
+            try:
+                winner = p.run(evaluator.evaluate, generations - p.generation)
+            finally:
+                evaluator.close()
+    finally:
+        if checkpointer is not None:
+            checkpointer.close()
+        if sink is not None:
+            sink.close()
+        if spectator.feed is not None:
+            spectator.feed.close()
+            spectator.feed = None
+        cache.save()
+    return winner, stats
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train cliff divers with NEAT")
+    parser.add_argument("--watch", action="store_true", help="render the divers while training")
+    parser.add_argument("--splashes", action="store_true", help="play the landing splashes in watch mode")
+    parser.add_argument("--spectate", type=int, default=0, help="show this many divers live in a separate window")
+    parser.add_argument("--spectate-mode", choices=("top", "sample"), default="top",
+                        help="show the fittest divers so far or a random sample")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for headless training, 0 for one per CPU")
+    parser.add_argument("--broker", default=None,
+                        help="evaluate through the distributed.py broker at HOST:PORT, or 'local' for one on this machine")
+    parser.add_argument("--batch-size", type=int, default=32, help="genomes per job sent to the broker")
+    parser.add_argument("--job-timeout", type=float, default=60.0,
+                        help="seconds before an unfinished job is handed to another worker")
+    parser.add_argument("--generation-timeout", type=float, default=600.0,
+                        help="seconds a generation may wait on the broker before the run fails")
+    parser.add_argument("--scenarios", type=int, default=0,
+                        help="score every genome against this many flip targets per generation (9 for all of them)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the run and the --scenarios sample")
+    parser.add_argument("--cache", default=None, help="file to keep the fitness cache in between runs")
+    parser.add_argument("--checkpoints", default="checkpoints", help="directory for per-generation checkpoints")
+    parser.add_argument("--resume", default=None, help="checkpoint file, or directory to resume from its newest checkpoint")
+    parser.add_argument("--profile", action="store_true", help="print where each generation's time goes")
+    parser.add_argument("--metrics", default=None, help=".jsonl or .csv file to append per-generation timings to")
+    parser.add_argument("--verbose", action="store_true", help="print every diver's landing angle and fitness")
+    parser.add_argument("--replays", default=None, help="directory to save a replay of each generation's best genome in")
+    parser.add_argument("--replay-trace", action="store_true", help="store the full state trace in each replay")
+    args = parser.parse_args()
+    scenarios = None
+    if args.scenarios:
+        scenarios = sample_scenarios(min(args.scenarios, len(sim.flip_requirements)), args.seed)
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, "config_feedforward.txt")
-    run(config_path)
\ No newline at end of file
+    run(config_path, render=args.watch, workers=args.workers, scenarios=scenarios, cache_path=args.cache, seed=args.seed,
+        checkpoint_dir=args.checkpoints, resume=args.resume, profile=args.profile, metrics_path=args.metrics,
+        verbose=args.verbose, replay_dir=args.replays, replay_trace=args.replay_trace,
+        splashes=args.splashes, spectate=args.spectate, spectate_mode=args.spectate_mode,
+        broker=args.broker, batch_size=args.batch_size, job_timeout=args.job_timeout,
+        generation_timeout=args.generation_timeout)
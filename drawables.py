@@ -0,0 +1,141 @@
+"""
+The diver, cliff and water of sim with their images, as drawn by Game.py, diving.py's
+watch mode and the spectator. Each takes the sim.DiveParams it moves with, so the same
+classes serve the game and the training.
+"""
+import assets
+import masks
+import sim
+import splash
+
+
+cliff_images = {
+        'top': 'imgs/Cliff1.png',
+        'middle': 'imgs/Cliff3.png'
+    }
+
+
+class Character(sim.Diver):
+    def __init__(self, image_paths, position, params):
+        super().__init__(position, params)
+        self.image_paths = image_paths
+        self.images = assets.images(image_paths)
+
+    def sprite(self, collide, position=None, angle=None):
+        """
+        :param position: (x, y) to draw at instead of the diver's position, e.g. interpolated between steps
+        :param angle: float, rotation to draw with instead of the diver's angle
+        :return: (surface, (x, y)) to blit, or None while the diver is hidden
+        """
+        if collide:
+            return None
+        position = self.position if position is None else position
+        angle = self.angle if angle is None else angle
+        # Rotated copies come from a shared cache, offset so they stay centered on the sprite
+        rotated_image, (dx, dy) = assets.rotations.get(self.image_paths[self.state], self.images[self.state], -angle)
+        return rotated_image, (round(position[0]) + dx, round(position[1]) + dy)
+
+    def draw(self, screen, collide, position=None, angle=None):
+        sprite = self.sprite(collide, position, angle)
+        if sprite is not None:
+            screen.blit(*sprite)
+
+    def get_mask(self):
+        """
+        gets the mask for the current image of the diver, built once per sprite state.
+        Collisions use the unrotated sprite, so one mask per state is enough.
+        :return: pygame.mask.Mask
+        """
+        return masks.cache.get(('diver', self.image_paths[self.state]), self.images[self.state])
+
+
+class Cliff(sim.Cliff):
+    """
+    Represents the scrolling cliffs of the game, moving vertically upward.
+    """
+
+    def __init__(self, image_paths, x, screen_height, params):
+        """
+        Initialize the cliff sections.
+        :param image_paths: dictionary of paths to cliff images (top, middle)
+        :param x: int, horizontal position to start drawing cliffs
+        :param screen_height: int, the height of the game screen
+        :param params: sim.DiveParams the cliff moves with
+        """
+        super().__init__(params)
+        self.images = assets.images(image_paths)
+        self.x = x
+        self.screen_height = screen_height
+
+    def sprite(self, y=None):
+        """
+        :param y: float, height to draw at instead of self.y
+        :return: (surface, (x, y)) of the current cliff section
+        """
+        return self.images[self.current_section], (self.x, self.y if y is None else y)
+
+    def draw(self, win, y=None):
+        """
+        Draw the cliff section to the game window.
+        """
+        win.blit(*self.sprite(y))
+
+
+class Base(sim.Base):
+    def __init__(self, imgs, params):
+        super().__init__(params)
+        self.imgs = imgs
+        self.splash = None  # splash.Splash playing, if any
+
+    def sprites(self, y=None):
+        """
+        :param y: float, height to draw at instead of self.y
+        :return: list of (surface, (x, y)) for the water and the splash on it, bottom first
+        """
+        y = self.y if y is None else y
+        return [(self.imgs[i], (0, y)) for i in (self.splash.images() if self.splash is not None else (0,))]
+
+    def draw(self, win, y=None):
+        win.blits(self.sprites(y), doreturn=False)
+
+    def collide(self, diver):
+        """
+        Check for collision between the base and the diver using masks, swept over the
+        vertical distance the diver moved relative to the base since its last check.
+        """
+        diver_key = ('diver', diver.image_paths[diver.state])
+        base_key = ('base', self.imgs[0].get_size())
+        diver_rows = masks.cache.opaque_rows(diver_key, diver.images[diver.state])
+        base_rows = masks.cache.opaque_rows(base_key, self.imgs[0])
+
+        # Calculate offset between the diver and the base
+        offset = (int(sim.BASE_OFFSET[0] - diver.position[0]), int(self.y - diver.position[1] + sim.BASE_OFFSET[1]))
+        previous = diver.previous_offset[1] if diver.previous_offset else offset[1]
+        diver.previous_offset = offset
+
+        # Broad phase: only the offsets where the opaque rows of both images can meet
+        if diver_rows is None or base_rows is None:
+            return False
+        low = max(min(previous, offset[1]), diver_rows[0] - base_rows[1])
+        high = min(max(previous, offset[1]), diver_rows[1] - base_rows[0])
+
+        # Exact mask test at every pixel of the sweep near contact
+        diver_mask = diver.get_mask()
+        base_mask = masks.cache.get(base_key, self.imgs[0])
+        return any(diver_mask.overlap(base_mask, (offset[0], oy)) is not None for oy in range(low, high + 1))
+
+    def start_splash(self, angle):
+        """
+        Start the splash for a diver that hit the water at `angle`. It plays out as the
+        loop calls update_splash and draw, so nothing waits for it.
+        """
+        self.splash = splash.Splash(angle, len(self.imgs))
+
+    def update_splash(self, dt):
+        """
+        :param dt: float, seconds of game time since the last frame
+        """
+        if self.splash is not None:
+            self.splash.update(dt)
+            if self.splash.done():
+                self.splash = None
@@ -0,0 +1,311 @@
+"""
+Environments for driving divers with any controller, not just NEAT networks.
+
+An episode is one dive. The observation is what the NEAT networks see: the target angle,
+the current angle and the height above the water. The action is 0 to tuck and 1 to
+release the tuck. The reward is 0 in the air and the landing reward of the configured
+fitness function on the tick the diver hits the water, which also ends the episode.
+The calls are shaped like Gym's, reset returns (observation, info) and step returns
+(observation, reward, terminated, truncated, info), but this is not a Gymnasium env:
+there are no spaces, reset takes only a seed, and the vector envs lay out info as below.
+Every dive ends in the water, so truncated is always False.
+
+    env = CliffDiveEnv()
+    observation, info = env.reset(seed=0)
+    terminated = False
+    while not terminated:
+        observation, reward, terminated, truncated, info = env.step(policy(observation))
+
+VectorCliffDiveEnv steps many dives at once and SubprocVectorEnv spreads them over
+worker processes. Both reset a dive as soon as it ends. The observation they return
+for it is then the first one of the next dive. Their step info holds one row per dive
+that ended on that step, in env order, rather than one per env: 'final_observation',
+the last observation of the dive, 'angle', its landing angle, and 'ticks', its length.
+The rows line up with the True entries of terminated, so info['angle'][k] belongs to
+env np.flatnonzero(terminated)[k].
+
+The world does not depend on the divers: the cliff and the water move the same way on
+every dive, so each vectorized dive can be at its own tick. The divers themselves move
+with the same population.advance, offsets and fall as population.PopulationSim.
+"""
+import multiprocessing
+
+import numpy as np
+
+import population
+import scoring
+import sim
+
+
+def _targets(flips):
+    return [flips] if np.isscalar(flips) else list(flips)
+
+
+class CliffDiveEnv:
+    """
+    One diver, stepped by sim.DiveSim.
+    """
+    def __init__(self, flips=None, params=sim.TRAINING_PARAMS, fitness_function=scoring.DEFAULT):
+        """
+        :param flips: float or list of floats, flip requirement of each dive, drawn from the
+                      list at every reset. All of sim.flip_requirements when None.
+        :param fitness_function: str, name of the landing reward in scoring.functions
+        """
+        self.targets = _targets(sim.flip_requirements if flips is None else flips)
+        self.score = scoring.functions[fitness_function]
+        self.sim = sim.DiveSim(params)
+        self.rng = np.random.default_rng()
+        self.total_angle = None
+        self.ended = True
+
+    def _observation(self):
+        return np.array(self.sim.observation(self.total_angle))
+
+    def reset(self, seed=None):
+        """
+        :param seed: int, reseeds the draw of the flip requirements
+        :return: (observation, info)
+        """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        flips = self.targets[self.rng.integers(len(self.targets))]
+        self.total_angle = flips * 360
+        self.sim.reset()
+        self.ended = False
+        return self._observation(), {'flips': flips}
+
+    def step(self, action):
+        """
+        :param action: 0 tucks, 1 releases the tuck
+        :return: (observation, reward, terminated, truncated, info)
+        """
+        if self.ended:
+            raise RuntimeError("The dive has ended, call reset() to start the next one")
+        self.ended = self.sim.step(int(action))
+        reward = 0.0
+        diver = self.sim.diver
+        if self.ended:
+            state = population.STATES.index(diver.state)
+            reward = float(self.score(np.array([diver.angle]), np.array([state]), np.array([self.total_angle]),
+                                      np.array([self.sim.ticks - 1]))[0])
+        return self._observation(), reward, self.ended, False, {'ticks': self.sim.ticks, 'angle': diver.angle}
+
+
+def world_timeline(params=sim.TRAINING_PARAMS, shapes=None):
+    """
+    Where the water is and whether the cliff is fixed at each tick, until the cliff stops.
+    :return: (base_y, fixed) arrays. base_y[t] is the height of the water before tick t,
+             fixed[t] is whether the cliff is fixed during tick t. Both stay at their last value after that.
+    """
+    cliff = sim.Cliff(params, shapes)
+    base = sim.Base(params, shapes)
+    base_y = [base.y]
+    fixed = []
+    while not cliff.middle_fixed:
+        cliff.start_moving()
+        cliff.move()
+        fixed.append(cliff.middle_fixed)
+        base.move(cliff.middle_fixed, 'straight')  # Every diver has jumped by the time the world moves
+        base_y.append(base.y)
+    return np.array(base_y), np.array(fixed)
+
+
+class VectorCliffDiveEnv:
+    """
+    `num_envs` divers, each on its own dive, stepped together with population.PopulationSim's
+    per-diver arithmetic.
+    """
+    def __init__(self, num_envs, flips=None, params=sim.TRAINING_PARAMS, fitness_function=scoring.DEFAULT,
+                 first_env=0):
+        """
+        :param first_env: int, index of the first of these envs in a larger vector, so a slice
+                          draws the same flip requirements as the whole vector would
+        """
+        self.num_envs = num_envs
+        self.targets = np.array(_targets(sim.flip_requirements if flips is None else flips), dtype=float)
+        self.params = params
+        self.score = scoring.functions[fitness_function]
+        self.first_env = first_env
+        shapes = sim.load_shapes()
+        self.contacts = population.ContactTable(shapes)
+        self.spin = np.array([0.0, params.straight_spin, params.tuck_spin])
+        self.base_y, self.fixed = world_timeline(params, shapes)
+        self.rngs = None
+        n = num_envs
+        self.active = np.ones(n, dtype=bool)
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self.vx = np.zeros(n)
+        self.vy = np.zeros(n)
+        self.angle = np.zeros(n)
+        self.state = np.zeros(n, dtype=np.int8)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.previous_oy = np.zeros(n, dtype=np.int64)
+        self.total_angle = np.zeros(n)
+
+    def _reset_rows(self, rows):
+        params = self.params
+        self.x[rows] = params.start_position[0]
+        self.y[rows] = params.start_position[1]
+        self.vx[rows] = 0.0
+        self.vy[rows] = 0.0
+        self.angle[rows] = 0.0
+        self.state[rows] = population.STANDING
+        self.ticks[rows] = 0
+        for row in np.flatnonzero(rows):
+            self.total_angle[row] = self.targets[self.rngs[row].integers(len(self.targets))] * 360
+
+    def _observations(self):
+        base_y = self.base_y[np.minimum(self.ticks, len(self.base_y) - 1)]
+        return np.stack((self.total_angle, self.angle, self.y - base_y), axis=1)
+
+    def reset(self, seed=None):
+        """
+        :param seed: int, env i draws its flip requirements from a generator seeded with (seed, i)
+        :return: (observations as an (num_envs, 3) array, info)
+        """
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        self.rngs = [np.random.default_rng((seed, self.first_env + i)) for i in range(self.num_envs)]
+        self._reset_rows(np.ones(self.num_envs, dtype=bool))
+        return self._observations(), {'flips': self.total_angle / 360}
+
+    def step(self, actions):
+        """
+        :param actions: int array, 0 tucks, 1 releases the tuck, anything else leaves the diver as it is
+        :return: (observations, rewards, terminated, truncated, info), info holds one row per
+                 dive that ended, not per env: its final observation, angle and length, in env order
+        """
+        params, state = self.params, self.state
+        population.advance(params, self.spin, np.asarray(actions), self.active, self.x, self.y, self.vx, self.vy,
+                           self.angle, state)
+
+        last = len(self.base_y) - 1
+        ox, oy = population.offsets(self.x, self.y, self.base_y[np.minimum(self.ticks, last)])
+        previous = np.where(self.ticks == 0, oy, self.previous_oy)
+        self.previous_oy = oy
+        terminated = self.contacts.collide(state, ox, previous, oy)
+
+        population.fall(params, self.fixed[np.minimum(self.ticks, last - 1)], self.y, state)
+        self.ticks += 1
+
+        rewards = np.zeros(self.num_envs)
+        info = {'final_observation': self._observations()[terminated], 'angle': self.angle[terminated],
+                'ticks': self.ticks[terminated]}
+        if terminated.any():
+            rewards[terminated] = self.score(self.angle[terminated], state[terminated], self.total_angle[terminated],
+                                             self.ticks[terminated] - 1)
+            self._reset_rows(terminated)
+        return self._observations(), rewards, terminated, np.zeros(self.num_envs, dtype=bool), info
+
+    def close(self):
+        pass
+
+
+def _serve(connection, num_envs, first_env, options):
+    envs = VectorCliffDiveEnv(num_envs, first_env=first_env, **options)
+    while True:
+        command, argument = connection.recv()
+        if command == 'step':
+            connection.send(envs.step(argument))
+        elif command == 'reset':
+            connection.send(envs.reset(argument))
+        else:
+            connection.close()
+            return
+
+
+class SubprocVectorEnv:
+    """
+    The same interface as VectorCliffDiveEnv, with the envs split over worker processes
+    that each step their share with NumPy. Gives the same results as one
+    VectorCliffDiveEnv of the same size and seed.
+    """
+    def __init__(self, num_envs, workers=None, **options):
+        """
+        :param workers: int, worker processes, one per CPU when None
+        :param options: passed on to VectorCliffDiveEnv
+        """
+        workers = min(workers or multiprocessing.cpu_count(), num_envs)
+        self.num_envs = num_envs
+        bounds = [num_envs * i // workers for i in range(workers + 1)]
+        self.slices = [slice(bounds[i], bounds[i + 1]) for i in range(workers)]
+        context = multiprocessing.get_context('spawn')
+        self.connections = []
+        self.processes = []
+        for part in self.slices:
+            connection, child = context.Pipe()
+            process = context.Process(target=_serve, args=(child, part.stop - part.start, part.start, options),
+                                      daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+    def reset(self, seed=None):
+        """
+        :param seed: int, see VectorCliffDiveEnv.reset
+        """
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        for connection in self.connections:
+            connection.send(('reset', seed))
+        parts = [connection.recv() for connection in self.connections]
+        return np.concatenate([obs for obs, _ in parts]), {'flips': np.concatenate([info['flips'] for _, info in parts])}
+
+    def step(self, actions):
+        """
+        :return: (observations, rewards, terminated, truncated, info) for all envs, as VectorCliffDiveEnv.step
+        """
+        actions = np.asarray(actions)
+        for connection, part in zip(self.connections, self.slices):
+            connection.send(('step', actions[part]))
+        parts = [connection.recv() for connection in self.connections]
+        arrays = [np.concatenate([part[i] for part in parts]) for i in range(4)]
+        info = {name: np.concatenate([part[4][name] for part in parts]) for name in parts[0][4]}
+        return (*arrays, info)
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(('close', None))
+        for process in self.processes:
+            process.join()
+
+
+def check_parity(n=50, seed=0, tuck_rate=0.3):
+    """
+    Dive the same random decisions in a VectorCliffDiveEnv and a population.PopulationSim,
+    and compare the first landing of each env.
+    :return: bool, True when every diver lands on the same tick at the same angle
+    """
+    rng = np.random.default_rng(seed)
+    envs = VectorCliffDiveEnv(n, flips=1.0)
+    envs.reset(seed)
+    divers = population.PopulationSim(n, backend='numpy')
+    angles = np.full(n, np.nan)
+    ticks = np.full(n, -1)
+    while not divers.landed.all():
+        actions = np.where(rng.random(n) < tuck_rate, population.TUCK_ACTION, population.RELEASE_ACTION)
+        divers.step(actions)
+        _, _, terminated, _, info = envs.step(actions)
+        new = terminated & np.isnan(angles)
+        angles[new] = info['angle'][new[terminated]]
+        ticks[new] = divers.ticks - 1
+    return bool(np.array_equal(angles, divers.angle) and np.array_equal(ticks, divers.landing_tick))
+
+
+if __name__ == "__main__":
+    import time
+
+    print("Vectorized env matches PopulationSim" if check_parity() else "Vectorized env differs from PopulationSim")
+    for name, envs in (('in-process', VectorCliffDiveEnv(2000)), ('subprocess', SubprocVectorEnv(2000))):
+        envs.reset(seed=0)
+        actions = np.ones(2000, dtype=np.int64)
+        envs.step(actions)
+        start = time.perf_counter()
+        landings = 0
+        for _ in range(2000):
+            landings += int(envs.step(actions)[2].sum())
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {2000 * 2000 / elapsed:,.0f} steps per sec, {landings} dives finished")
+        envs.close()
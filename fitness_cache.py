@@ -0,0 +1,102 @@
+"""
+Memoized episode results, so genomes that survive unchanged are not simulated again.
+
+Episodes are deterministic: a genome's result only depends on its genes, the flip
+requirements it dives for, the physics constants and the fitness function. The cache
+is keyed by a content hash of the genome followed by a hash of the other three, so the
+entries of given genomes can be picked out.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+FORMAT_VERSION = 2
+
+
+def genome_hash(genome):
+    """
+    :return: str, hex digest of every node and connection gene of the genome
+    """
+    nodes = sorted((key, ng.bias, ng.response, ng.activation, ng.aggregation) for key, ng in genome.nodes.items())
+    connections = sorted((key, cg.weight, cg.enabled) for key, cg in genome.connections.items())
+    return hashlib.sha1(repr((nodes, connections)).encode()).hexdigest()
+
+
+def episode_key(genome, scenarios, params, scoring='default'):
+    """
+    :param scenarios: list of flip requirements the genome dives for
+    :param params: sim.DiveParams the episode runs with
+    :param scoring: str, name of the fitness function the result was scored with
+    """
+    return genome_hash(genome) + ':' + hashlib.sha1(repr((list(scenarios), params, scoring)).encode()).hexdigest()
+
+
+class FitnessCache:
+    """
+    Bounded LRU map from episode_key to the episode's result, optionally saved to disk.
+    """
+    def __init__(self, max_size=100000, path=None):
+        """
+        :param max_size: int, most entries kept before the least recently used are dropped
+        :param path: str, JSON file the cache is loaded from now and written to by save()
+        """
+        self.max_size = max_size
+        self.path = path
+        self.entries = OrderedDict()
+        self.by_genome = {}  # genome_hash -> keys of its entries
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        self.by_genome.setdefault(key.split(':', 1)[0], set()).add(key)
+        while len(self.entries) > self.max_size:
+            old, _ = self.entries.popitem(last=False)
+            genome = old.split(':', 1)[0]
+            self.by_genome[genome].discard(old)
+            if not self.by_genome[genome]:
+                del self.by_genome[genome]
+
+    def entries_for(self, genomes):
+        """
+        :param genomes: iterable of genomes
+        :return: list of (key, result) of the cached episodes of those genomes
+        """
+        keys = set()
+        for genome in genomes:
+            keys.update(self.by_genome.get(genome_hash(genome), ()))
+        return [(key, self.entries[key]) for key in keys]
+
+    def load(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != FORMAT_VERSION:
+            return
+        for key, result in data['entries']:
+            self.put(key, result)
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+        # Write next to the target and swap it in, so a crash never leaves half a file
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'entries': list(self.entries.items())}, f)
+        os.replace(path + '.tmp', path)
+
+    def __str__(self):
+        return f"{len(self.entries)} episodes, {self.hits} hits, {self.misses} misses"
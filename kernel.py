@@ -0,0 +1,147 @@
+"""
+Optional compiled kernel for population.PopulationSim.step.
+
+The kernel does a tick's per-diver work in two loops over the population arrays.
+advance() covers the jump, the tuck decision, take-off, spin, the offsets from the water
+and the broad phase of the impact test. impact() covers the exact impact test and the fall.
+In between, PopulationSim looks up the contact table for the divers near the water.
+
+With Numba installed the loops are compiled at first use and PopulationSim uses them.
+Without it they stay plain Python, which is far slower than the NumPy step, so
+PopulationSim keeps the NumPy step. Both give the same result bit for bit;
+`python kernel.py` checks that on a random population.
+"""
+import sys
+import time
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+COMPILED = numba is not None
+BACKEND = 'kernel' if COMPILED else 'numpy'  # What PopulationSim uses by default
+
+# Same codes as population.STATES and population's actions
+STANDING, STRAIGHT, TUCK = 0, 1, 2
+TUCK_ACTION, RELEASE_ACTION = 0, 1
+
+
+def jit(function):
+    """
+    Compile `function` with Numba when it is installed, otherwise leave it as it is.
+    """
+    return numba.njit(cache=True)(function) if COMPILED else function
+
+
+@jit
+def advance(actions, x, y, vx, vy, angle, state, landed, spin, jump_vx, jump_vy, gravity, push,
+            push_limit, takeoff_floor, base_y, offset_x, offset_y, first_tick, previous_oy, ox,
+            sweep_low, sweep_high, near, low, first_contact, last_contact):
+    """
+    Move every diver in the air by one tick and find the ones whose sweep reaches the water.
+    Fills ox, sweep_low, sweep_high and near, and updates previous_oy.
+    :return: (number of divers near the water, their lowest ox, their highest ox)
+    """
+    count = 0
+    ox_min = 0
+    ox_max = 0
+    for i in range(x.shape[0]):
+        active = not landed[i]
+        if active:
+            if state[i] == STANDING:
+                state[i] = STRAIGHT
+                vx[i] = jump_vx
+                vy[i] = jump_vy
+            if actions[i] == TUCK_ACTION and state[i] == STRAIGHT:
+                state[i] = TUCK
+            elif actions[i] == RELEASE_ACTION and state[i] == TUCK:
+                state[i] = STRAIGHT
+            if y[i] < takeoff_floor:
+                x[i] += vx[i]
+                y[i] += vy[i]
+                vy[i] += gravity
+                if x[i] < push_limit:
+                    vx[i] += push
+            angle[i] += spin[state[i]]
+
+        # Offsets are kept for every diver, like the NumPy step does
+        ox[i] = np.int64(offset_x - x[i])
+        oy = np.int64(base_y - y[i] + offset_y)
+        first = oy if first_tick else previous_oy[i]
+        previous_oy[i] = oy
+        sweep_low[i] = min(first, oy) - low
+        sweep_high[i] = max(first, oy) - low
+        near[i] = active and sweep_high[i] >= first_contact and sweep_low[i] <= last_contact
+        if near[i]:
+            if count == 0 or ox[i] < ox_min:
+                ox_min = ox[i]
+            if count == 0 or ox[i] > ox_max:
+                ox_max = ox[i]
+            count += 1
+    return count, ox_min, ox_max
+
+
+@jit
+def impact(state, ox, sweep_low, sweep_high, near, counts, first_ox, length, landed, landing_tick,
+           y, fixed, fall_speed, tick):
+    """
+    Exact impact test for the divers near the water, then the fall once the cliff is fixed.
+    :param counts: ContactTable.table covering every ox of the near divers from first_ox on
+    """
+    for i in range(y.shape[0]):
+        if landed[i]:
+            continue
+        hit = False
+        if near[i]:
+            column = ox[i] - first_ox
+            low = min(max(sweep_low[i], 0), length)
+            high = min(max(sweep_high[i] + 1, 0), length)
+            hit = counts[state[i], column, high] > counts[state[i], column, low]
+        if fixed and state[i] != STANDING:
+            y[i] += fall_speed
+        if hit:
+            landed[i] = True
+            landing_tick[i] = tick
+
+
+def check_parity(n=200, seed=0, tuck_rate=0.3):
+    """
+    Step the same population with the kernel and with the NumPy step, using random
+    decisions, and compare every array after every tick.
+    :return: int, first tick where the two differ, or None when they match to the last bit
+    """
+    import population
+
+    rng = np.random.default_rng(seed)
+    reference = population.PopulationSim(n, backend='numpy')
+    candidate = population.PopulationSim(n, backend='kernel')
+    names = ('x', 'y', 'vx', 'vy', 'angle', 'state', 'landed', 'landing_tick', 'previous_oy')
+    while not reference.landed.all():
+        actions = np.where(rng.random(n) < tuck_rate, TUCK_ACTION, RELEASE_ACTION)
+        reference.step(actions)
+        candidate.step(actions)
+        same = all(np.array_equal(getattr(reference, name), getattr(candidate, name)) for name in names)
+        same = same and reference.base.y == candidate.base.y and reference.cliff.y == candidate.cliff.y
+        if not same:
+            return reference.ticks - 1
+    return None if candidate.landed.all() else reference.ticks
+
+
+if __name__ == "__main__":
+    import population
+
+    print(f"Numba {'found' if COMPILED else 'not installed'}, PopulationSim uses the {BACKEND} step by default")
+    mismatch = check_parity()
+    print("Kernel matches the NumPy step" if mismatch is None else f"Kernel differs from the NumPy step at tick {mismatch}")
+    for backend in ('numpy', 'kernel'):
+        divers = population.PopulationSim(2000, backend=backend)
+        divers.step(np.ones(2000, dtype=np.int64))  # Compiles the kernel before timing
+        start = time.perf_counter()
+        while not divers.landed.all():
+            divers.step(np.ones(2000, dtype=np.int64))
+        print(f"{backend:>6}: {(time.perf_counter() - start) / divers.ticks * 1e6:.1f} us per tick for 2000 divers")
+    sys.exit(mismatch is not None)
@@ -0,0 +1,44 @@
+"""
+Process-wide cache of collision masks for the classes in drawables.py.
+"""
+import pygame
+
+
+class MaskCache:
+    """
+    Builds each mask once per key and counts hits and misses.
+    """
+    def __init__(self):
+        self.masks = {}
+        self.rows = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, surface):
+        """
+        :param key: hashable name for the image, e.g. its path and size
+        :param surface: pygame.Surface the mask is built from on a miss
+        :return: pygame.mask.Mask
+        """
+        mask = self.masks.get(key)
+        if mask is None:
+            self.misses += 1
+            mask = self.masks[key] = pygame.mask.from_surface(surface)
+        else:
+            self.hits += 1
+        return mask
+
+    def opaque_rows(self, key, surface):
+        """
+        :return: (first, last) row holding opaque pixels in the mask for `key`, None if it is empty
+        """
+        if key not in self.rows:
+            rects = self.get(key, surface).get_bounding_rects()
+            self.rows[key] = (min(r.top for r in rects), max(r.bottom for r in rects) - 1) if rects else None
+        return self.rows[key]
+
+    def __str__(self):
+        return f"{len(self.masks)} masks, {self.hits} hits, {self.misses} misses"
+
+
+cache = MaskCache()
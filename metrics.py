@@ -0,0 +1,178 @@
+"""
+Per-phase timing for the training loop.
+
+The training code marks where each phase of a tick ends on the process-wide `recorder`.
+While the recorder is disabled, which is the default, every call returns at once, so
+the marks can stay in place in production runs. MetricsReporter turns the totals into
+one record per generation, printed and optionally written to a JSONL or CSV file.
+
+Evaluation that runs in other processes (parallel.ParallelEvaluator) is not timed per
+phase, only its wall time and episode count are seen here.
+"""
+import csv
+import json
+import os
+import time
+from collections import defaultdict
+
+import neat
+
+
+PHASES = ('activation', 'physics', 'collision', 'scoring', 'rendering')
+FIELDS = (('generation', 'wall_time', 'episodes', 'ticks', 'episodes_per_sec', 'ticks_per_sec')
+          + PHASES + tuple(f'{phase}_per_tick' for phase in PHASES))
+
+
+class _Timer:
+    """
+    Adds the time since the previous lap to the phase named by each lap.
+    """
+    __slots__ = ('phases', 'last')
+
+    def __init__(self, phases):
+        self.phases = phases
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phases[phase] += now - self.last
+        self.last = now
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def lap(self, phase):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+class Metrics:
+    """
+    Running totals of seconds per phase and of counters such as ticks and episodes.
+    """
+    def __init__(self, enabled=False, verbose=False):
+        """
+        :param enabled: bool, record timings and counts
+        :param verbose: bool, let log() print the per-diver debug output
+        """
+        self.enabled = enabled
+        self.verbose = verbose
+        self.phases = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    def timer(self):
+        """
+        :return: an object whose lap(phase) charges the time since the last lap to phase
+        """
+        return _Timer(self.phases) if self.enabled else _null_timer
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counts[name] += amount
+
+    def log(self, *args):
+        if self.verbose:
+            print(*args)
+
+    def reset(self):
+        self.phases.clear()
+        self.counts.clear()
+
+    def record(self, generation, wall_time):
+        """
+        :return: dict with one value per name in FIELDS
+        """
+        ticks = self.counts['ticks']
+        episodes = self.counts['episodes']
+        record = {
+            'generation': generation,
+            'wall_time': wall_time,
+            'episodes': episodes,
+            'ticks': ticks,
+            'episodes_per_sec': episodes / wall_time if wall_time else 0.0,
+            'ticks_per_sec': ticks / wall_time if wall_time else 0.0,
+        }
+        for phase in PHASES:
+            record[phase] = self.phases[phase]
+        for phase in PHASES:
+            record[f'{phase}_per_tick'] = self.phases[phase] / ticks if ticks else 0.0
+        return record
+
+
+recorder = Metrics()
+
+
+class JsonlSink:
+    """
+    Appends one JSON object per record to a file.
+    """
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class CsvSink:
+    """
+    Appends one row per record to a CSV file, with a header row when the file is new.
+    """
+    def __init__(self, path):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.DictWriter(self.file, FIELDS)
+        if new:
+            self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerow(record)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def open_sink(path):
+    """
+    :param path: str, a .csv path gets a CsvSink, anything else a JsonlSink
+    """
+    return CsvSink(path) if path.endswith('.csv') else JsonlSink(path)
+
+
+class MetricsReporter(neat.reporting.BaseReporter):
+    """
+    Reporter that times each generation and reports what the recorder saw during it.
+    """
+    def __init__(self, metrics=None, sink=None, stdout=True):
+        """
+        :param metrics: Metrics to report on, the module's recorder when None
+        :param sink: JsonlSink or CsvSink every record is written to
+        :param stdout: bool, print a summary line per generation
+        """
+        self.metrics = metrics or recorder
+        self.sink = sink
+        self.stdout = stdout
+        self.generation = None
+        self.started = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.metrics.reset()
+        self.started = time.perf_counter()
+
+    def end_generation(self, config, population, species_set):
+        record = self.metrics.record(self.generation, time.perf_counter() - self.started)
+        if self.sink is not None:
+            self.sink.write(record)
+        if self.stdout:
+            print(f"Generation time {record['wall_time']:.3f} sec, {record['episodes']} episodes "
+                  f"({record['episodes_per_sec']:.1f}/sec), {record['ticks']} ticks ({record['ticks_per_sec']:.1f}/sec)")
+            if record['ticks']:
+                print("Per tick: " + ", ".join(f"{phase} {record[phase + '_per_tick'] * 1e6:.1f} us" for phase in PHASES))
@@ -0,0 +1,59 @@
+"""
+Spreads headless genome evaluation over a pool of worker processes.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import sim
+
+
+_config = None
+
+
+def _start_worker(config):
+    """
+    Runs once in each worker: keep the NEAT config and load the collision shapes.
+    """
+    global _config
+    _config = config
+    sim.load_shapes()
+
+
+def _episodes(genomes, scenarios):
+    import diving
+    return diving.episodes(genomes, _config, scenarios)
+
+
+class ParallelEvaluator:
+    """
+    Drop-in fitness function for Population.run that splits each generation into one
+    chunk per worker. Every chunk in a generation uses the same flip_requirement, or
+    the same list of scenarios.
+    """
+    def __init__(self, num_workers, config, scenarios=None, cache=None):
+        """
+        :param num_workers: int, number of worker processes, 0 for one per CPU
+        :param config: neat.Config handed to every worker once at start-up
+        :param scenarios: list of flip requirements, see diving.evaluate
+        :param cache: fitness_cache.FitnessCache kept in this process, only misses reach the workers
+        """
+        self.num_workers = num_workers or os.cpu_count()
+        self.scenarios = scenarios
+        self.cache = cache
+        self.pool = ProcessPoolExecutor(self.num_workers, initializer=_start_worker, initargs=(config,))
+
+    def episodes(self, genomes, config, scenarios):
+        """
+        Same as diving.episodes, run as one chunk per worker.
+        """
+        size = -(-len(genomes) // self.num_workers)
+        chunks = [genomes[i:i + size] for i in range(0, len(genomes), size)]
+        jobs = [self.pool.submit(_episodes, chunk, scenarios) for chunk in chunks]
+        return [result for job in jobs for result in job.result()]
+
+    def evaluate(self, genomes, config):
+        import diving
+        diving.evaluate(genomes, config, scenarios=self.scenarios, cache=self.cache, run_episodes=self.episodes)
+
+    def close(self):
+        self.pool.shutdown()
@@ -0,0 +1,247 @@
+"""
+Vectorized stepping for a whole population of divers.
+
+PopulationSim keeps every diver's position, velocity, angle and state in NumPy arrays
+and advances all of them with one array operation per tick. It follows the same rules
+as sim.DiveSim, but the cliff and water are shared and move once per tick. Each diver
+freezes in place when it hits the water.
+
+advance(), offsets() and fall() are the per-diver arithmetic of a tick. They take the
+height of the water per diver or shared, so environment.VectorCliffDiveEnv steps dives
+that are each at their own tick with the same code.
+"""
+import numpy as np
+
+import kernel
+import metrics
+import sim
+
+
+STATES = ('standing', 'straight', 'tuck')
+STANDING, STRAIGHT, TUCK = range(3)
+TUCK_ACTION, RELEASE_ACTION = 0, 1
+
+
+class ContactTable:
+    """
+    Precomputed answers to Shape.sweep between each diver state and the base.
+
+    For a given state and horizontal offset, the vertical offsets that overlap are stored
+    as one boolean row. Rows are built the first time an offset is seen. Divers only move
+    sideways during take-off, so only a handful of rows are ever built.
+    """
+    def __init__(self, shapes):
+        self.sprites = [shapes[state] for state in STATES]
+        self.base = shapes['base']
+        self.low = -(self.base.height - 1)  # Lowest oy that can overlap anything
+        self.length = max(sprite.height for sprite in self.sprites) + self.base.height - 1
+        # Index range of the waterline band: outside it no state can touch the base
+        self.first_contact = min(sprite.top for sprite in self.sprites) - self.base.bottom - self.low
+        self.last_contact = max(sprite.bottom for sprite in self.sprites) - self.base.top - self.low
+        self.rows = {}
+        self.tables = {}
+
+    def row(self, state, ox):
+        """
+        :return: bool array of which oy values collide, starting at self.low
+        """
+        key = (state, ox)
+        if key not in self.rows:
+            sprite = self.sprites[state]
+            hits = np.zeros(self.length, dtype=bool)
+            for x in range(max(0, ox), min(sprite.width, ox + self.base.width)):
+                for top, bottom in sprite.columns[x]:
+                    for base_top, base_bottom in self.base.columns[x - ox]:
+                        first, last = top - base_bottom, bottom - base_top
+                        hits[first - self.low:last - self.low + 1] = True
+            self.rows[key] = hits
+        return self.rows[key]
+
+    def table(self, first_ox, count):
+        """
+        :return: (3, count, length + 1) array of running hit counts covering horizontal offsets
+                 first_ox .. first_ox + count - 1, so any range of oy can be tested in O(1)
+        """
+        key = (first_ox, count)
+        if key not in self.tables:
+            rows = np.array([[self.row(state, first_ox + i) for i in range(count)]
+                             for state in range(len(STATES))])
+            counts = np.zeros(rows.shape[:2] + (self.length + 1,), dtype=np.int64)
+            np.cumsum(rows, axis=2, out=counts[:, :, 1:])
+            self.tables[key] = counts
+        return self.tables[key]
+
+    def collide(self, state, ox, first_oy, last_oy):
+        """
+        Vectorized Shape.sweep for integer offset arrays.
+        :return: bool array, True where the diver touches the base anywhere between first_oy and last_oy
+        """
+        result = np.zeros(len(state), dtype=bool)
+        low = np.minimum(first_oy, last_oy) - self.low
+        high = np.maximum(first_oy, last_oy) - self.low
+        # Broad phase: only divers whose sweep reaches the band where contact is possible
+        near = (high >= self.first_contact) & (low <= self.last_contact)
+        if not near.any():
+            return result
+        state, ox = state[near], ox[near]
+        low = np.clip(low[near], 0, self.length)
+        high = np.clip(high[near] + 1, 0, self.length)
+        first_ox = int(ox.min())
+        counts = self.table(first_ox, int(ox.max()) - first_ox + 1)
+        column = ox - first_ox
+        result[near] = counts[state, column, high] > counts[state, column, low]
+        return result
+
+
+def advance(params, spin, actions, active, x, y, vx, vy, angle, state):
+    """
+    Jump, tuck or release, take-off and spin for the `active` divers, in place.
+    :param spin: float array, degrees per tick for each state
+    """
+    jumping = active & (state == STANDING)
+    state[jumping] = STRAIGHT
+    vx[jumping] = params.jump_velocity_x
+    vy[jumping] = params.jump_velocity_y
+
+    state[active & (actions == TUCK_ACTION) & (state == STRAIGHT)] = TUCK
+    state[active & (actions == RELEASE_ACTION) & (state == TUCK)] = STRAIGHT
+
+    rising = active & (y < params.takeoff_floor)
+    x[rising] += vx[rising]
+    y[rising] += vy[rising]
+    vy[rising] += params.gravity
+    pushed = rising & (x < params.push_limit)
+    vx[pushed] += params.push
+
+    angle[active] += spin[state[active]]
+
+
+def offsets(x, y, base_y):
+    """
+    :param base_y: float, or an array with the height of the water under each diver
+    :return: (ox, oy) integer offsets of the water from each diver, as ContactTable.collide takes them
+    """
+    ox = (sim.BASE_OFFSET[0] - x).astype(np.int64)
+    oy = (base_y - y + sim.BASE_OFFSET[1]).astype(np.int64)
+    return ox, oy
+
+
+def fall(params, falling, y, state):
+    """
+    Drop the `falling` divers that have jumped by one tick of the fixed cliff, in place.
+    """
+    y[falling & (state != STANDING)] += params.fall_speed
+
+
+class PopulationSim:
+    """
+    N divers stepped together against one shared cliff and water.
+    """
+    def __init__(self, n, params=sim.TRAINING_PARAMS, shapes=None, backend=None):
+        """
+        :param backend: 'numpy' for the array step, 'kernel' for kernel.advance and kernel.impact,
+                        kernel.BACKEND when None, which is the kernel only when Numba is installed
+        """
+        self.n = n
+        self.backend = backend or kernel.BACKEND
+        self.params = params
+        self.shapes = shapes or sim.load_shapes()
+        self.contacts = ContactTable(self.shapes)
+        self.spin = np.array([0.0, params.straight_spin, params.tuck_spin])
+        self.reset()
+
+    def reset(self):
+        n, params = self.n, self.params
+        self.x = np.full(n, float(params.start_position[0]))
+        self.y = np.full(n, float(params.start_position[1]))
+        self.vx = np.zeros(n)
+        self.vy = np.zeros(n)
+        self.angle = np.zeros(n)
+        self.state = np.full(n, STANDING, dtype=np.int8)
+        self.landed = np.zeros(n, dtype=bool)
+        self.landing_tick = np.full(n, -1, dtype=np.int64)
+        self.previous_oy = None  # Offsets from the base at the last collision check
+        self.cliff = sim.Cliff(params, self.shapes)
+        self.base = sim.Base(params, self.shapes)
+        self.ticks = 0
+        # Scratch arrays for the kernel step
+        self.ox = np.zeros(n, dtype=np.int64)
+        self.sweep_low = np.zeros(n, dtype=np.int64)
+        self.sweep_high = np.zeros(n, dtype=np.int64)
+        self.near = np.zeros(n, dtype=bool)
+
+    def observations(self, total_angle):
+        """
+        Network inputs for every diver as an (n, 3) array: target angle, current angle and height above the base.
+        :param total_angle: float, or an array with one target angle per diver
+        """
+        targets = np.broadcast_to(np.asarray(total_angle, dtype=float), (self.n,))
+        return np.stack((targets, self.angle, self.y - self.base.y), axis=1)
+
+    def step(self, actions):
+        """
+        Advance every diver that is still in the air by one tick.
+        :param actions: int array, 0 tucks, 1 releases the tuck, anything else leaves the diver as it is
+        :return: bool array of divers that have hit the water
+        """
+        if self.backend == 'kernel':
+            return self._step_kernel(np.asarray(actions, dtype=np.int64))
+        params = self.params
+        timer = metrics.recorder.timer()
+        active = ~self.landed
+        actions = np.asarray(actions)
+
+        advance(params, self.spin, actions, active, self.x, self.y, self.vx, self.vy, self.angle, self.state)
+        timer.lap('physics')
+
+        ox, oy = offsets(self.x, self.y, self.base.y)
+        previous = oy if self.previous_oy is None else self.previous_oy
+        self.previous_oy = oy
+        hit = active & self.contacts.collide(self.state, ox, previous, oy)
+        timer.lap('collision')
+
+        # The world moves once per tick, whatever the population size
+        self.cliff.start_moving()
+        self.cliff.move()
+        if self.cliff.middle_fixed:
+            fall(params, active, self.y, self.state)
+        self.base.move(self.cliff.middle_fixed, 'standing' if (self.state == STANDING).all() else 'straight')
+
+        self.landed |= hit
+        self.landing_tick[hit] = self.ticks
+        self.ticks += 1
+        timer.lap('physics')
+        return self.landed
+
+    def _step_kernel(self, actions):
+        """
+        The same tick as step(), with the per-diver work done by the kernel.
+        """
+        params, contacts = self.params, self.contacts
+        timer = metrics.recorder.timer()
+        first_tick = self.previous_oy is None
+        if first_tick:
+            self.previous_oy = np.zeros(self.n, dtype=np.int64)
+        near, first_ox, last_ox = kernel.advance(
+            actions, self.x, self.y, self.vx, self.vy, self.angle, self.state, self.landed, self.spin,
+            params.jump_velocity_x, params.jump_velocity_y, params.gravity, params.push, params.push_limit,
+            params.takeoff_floor, self.base.y, sim.BASE_OFFSET[0], sim.BASE_OFFSET[1], first_tick,
+            self.previous_oy, self.ox, self.sweep_low, self.sweep_high, self.near, contacts.low,
+            contacts.first_contact, contacts.last_contact)
+        timer.lap('physics')
+
+        # The cliff does not depend on the divers, so it can move before the fall that depends on it
+        self.cliff.start_moving()
+        self.cliff.move()
+        if not near:
+            first_ox, last_ox = 0, 0
+        counts = contacts.table(int(first_ox), int(last_ox - first_ox) + 1)
+        kernel.impact(self.state, self.ox, self.sweep_low, self.sweep_high, self.near, counts, first_ox,
+                      contacts.length, self.landed, self.landing_tick, self.y, self.cliff.middle_fixed,
+                      params.fall_speed, self.ticks)
+        timer.lap('collision')
+
+        self.base.move(self.cliff.middle_fixed, 'standing' if (self.state == STANDING).all() else 'straight')
+        self.ticks += 1
+        timer.lap('physics')
+        return self.landed
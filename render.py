@@ -0,0 +1,83 @@
+"""
+Dirty-rectangle rendering for the game window.
+
+Each frame the loop describes the whole scene as a list of keyed blits, bottom first.
+DirtyRenderer compares it with the previous frame and redraws and pushes to the
+display only the regions where a blit appeared, disappeared, moved or changed surface.
+Once the cliff is fixed that is the divers, the water and nothing else.
+"""
+import pygame
+
+
+class DirtyRenderer:
+    """
+    Draws scenes of keyed blits over a plain background color, one frame at a time.
+    """
+    def __init__(self, screen, bg_color, max_regions=16, full_fraction=0.6):
+        """
+        :param screen: pygame.Surface of the window
+        :param bg_color: color behind everything
+        :param max_regions: int, more separate changed regions than this are merged into one
+        :param full_fraction: float, redraw the whole window when the changed area is larger than this part of it
+        """
+        self.screen = screen
+        self.bg_color = bg_color
+        self.max_regions = max_regions
+        self.full_fraction = full_fraction
+        self.bounds = screen.get_rect()
+        self.previous = {}
+        self.full = True
+
+    def _regions(self, rects):
+        regions = []
+        for rect in rects:
+            rect = rect.clip(self.bounds)
+            if not rect.width or not rect.height:
+                continue
+            i = rect.collidelist(regions)
+            while i != -1:
+                rect = rect.union(regions.pop(i))
+                i = rect.collidelist(regions)
+            regions.append(rect)
+        if len(regions) > self.max_regions:
+            regions = [regions[0].unionall(regions[1:])]
+        return regions
+
+    def render(self, scene):
+        """
+        Draw one frame and push the changed parts of it to the display.
+        :param scene: list of (key, surface, (x, y)) in drawing order. Keys are unique within a
+                      frame and name the same thing from one frame to the next, e.g. ('diver', 3).
+        :return: list of pygame.Rect pushed to the display
+        """
+        current = {}
+        dirty = []
+        for key, surface, position in scene:
+            rect = surface.get_rect(topleft=position)
+            current[key] = (surface, position, rect)
+            old = self.previous.get(key)
+            if old is None or old[0] is not surface or old[1] != position:
+                dirty.append(rect)
+                if old is not None:
+                    dirty.append(old[2])
+        for key in self.previous.keys() - current.keys():
+            dirty.append(self.previous[key][2])
+        self.previous = current
+
+        blits = [(surface, position) for _, surface, position in scene]
+        regions = self._regions(dirty)
+        if self.full or sum(r.width * r.height for r in regions) > self.full_fraction * self.bounds.width * self.bounds.height:
+            self.full = False
+            self.screen.fill(self.bg_color)
+            self.screen.blits(blits, doreturn=False)
+            pygame.display.update()
+            return [self.bounds]
+
+        for region in regions:
+            # Everything is drawn again in order, but clipped to the region that changed
+            self.screen.set_clip(region)
+            self.screen.fill(self.bg_color)
+            self.screen.blits(blits, doreturn=False)
+        self.screen.set_clip(None)
+        pygame.display.update(regions)
+        return regions
@@ -0,0 +1,205 @@
+"""
+Compact binary replays of single dives.
+
+A dive is deterministic given the physics constants and the diver's decision on each
+tick, so a replay stores only those: a fixed header, the DiveParams as doubles, and
+one bit per tick that says whether the network chose to tuck. An optional trace adds
+the diver's x, y, angle and state for every tick, to check a playback against.
+
+Layout, little-endian:
+    header      magic, version, flags, seed, flip target, generation, genome key,
+                fitness, ticks, number of params
+    params      one double per DiveParams value, tuples flattened
+    tucks       ceil(ticks / 8) bytes, np.packbits order, 1 where the diver tucked
+    trace       ticks x (x, y, angle) float32, then ticks x state uint8, when FLAG_TRACE is set
+"""
+import dataclasses
+import os
+import struct
+
+import neat
+import numpy as np
+
+import population
+import sim
+
+
+MAGIC = b'CDRP'
+FORMAT_VERSION = 1
+FLAG_TRACE = 1
+FLAG_SEED = 2
+HEADER = struct.Struct('<4sBBqdIIdIB')
+
+
+def _pack_params(params):
+    values = []
+    for field in dataclasses.fields(params):
+        value = getattr(params, field.name)
+        values.extend(value if isinstance(value, tuple) else [value])
+    return values
+
+
+def _unpack_params(values):
+    kwargs = {}
+    values = list(values)
+    for field in dataclasses.fields(sim.DiveParams):
+        if isinstance(field.default, tuple):
+            size = len(field.default)
+            kwargs[field.name], values = tuple(values[:size]), values[size:]
+        else:
+            kwargs[field.name], values = values[0], values[1:]
+    return sim.DiveParams(**kwargs)
+
+
+class Replay:
+    """
+    One recorded dive: the flip target, the physics constants and the tuck decision of every tick.
+    """
+    def __init__(self, flip_target, tucks, params=sim.TRAINING_PARAMS, seed=None, generation=0,
+                 genome_key=0, fitness=0.0, trace=None):
+        """
+        :param flip_target: float, flip requirement the diver aimed for
+        :param tucks: list of bool, one per tick, True where the diver chose to tuck
+        :param params: sim.DiveParams the dive ran with
+        :param seed: int, seed of the training run, None when it was not seeded
+        :param trace: (ticks, 4) array of x, y, angle and state index after each tick, or None
+        """
+        self.flip_target = flip_target
+        self.tucks = list(tucks)
+        self.params = params
+        self.seed = seed
+        self.generation = generation
+        self.genome_key = genome_key
+        self.fitness = fitness
+        self.trace = trace
+
+    def actions(self):
+        """
+        :return: the action to pass to sim.DiveSim.step on each tick
+        """
+        return [population.TUCK_ACTION if tuck else population.RELEASE_ACTION for tuck in self.tucks]
+
+    def play(self, dive=None):
+        """
+        Step a dive through the recorded decisions, yielding it after every tick.
+        :param dive: sim.DiveSim to step, a fresh one with the replay's params when None.
+                     Game.py passes one whose diver, cliff and base can be drawn.
+        """
+        dive = dive or sim.DiveSim(self.params)
+        for action in self.actions():
+            dive.step(action)
+            yield dive
+
+    def verify(self, tolerance=1e-3):
+        """
+        Play the replay headless and compare it with the trace.
+        :return: int, first tick that differs from the trace, or None when it matches or there is no trace
+        """
+        if self.trace is None:
+            return None
+        for tick, dive in enumerate(self.play()):
+            diver = dive.diver
+            expected = self.trace[tick]
+            if (abs(diver.position[0] - expected[0]) > tolerance or abs(diver.position[1] - expected[1]) > tolerance
+                    or abs(diver.angle - expected[2]) > tolerance or population.STATES.index(diver.state) != expected[3]):
+                return tick
+        return None
+
+    def to_bytes(self):
+        params = _pack_params(self.params)
+        flags = (FLAG_TRACE if self.trace is not None else 0) | (FLAG_SEED if self.seed is not None else 0)
+        data = HEADER.pack(MAGIC, FORMAT_VERSION, flags, self.seed or 0, self.flip_target, self.generation,
+                           self.genome_key, self.fitness, len(self.tucks), len(params))
+        data += struct.pack(f'<{len(params)}d', *params)
+        data += np.packbits(np.asarray(self.tucks, dtype=bool)).tobytes()
+        if self.trace is not None:
+            trace = np.asarray(self.trace)
+            data += trace[:, :3].astype('<f4').tobytes() + trace[:, 3].astype(np.uint8).tobytes()
+        return data
+
+    @staticmethod
+    def from_bytes(data):
+        magic, version, flags, seed, flip_target, generation, genome_key, fitness, ticks, count = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a replay")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Replay format {version}, expected {FORMAT_VERSION}")
+        offset = HEADER.size
+        params = _unpack_params(struct.unpack_from(f'<{count}d', data, offset))
+        offset += 8 * count
+        size = (ticks + 7) // 8
+        tucks = np.unpackbits(np.frombuffer(data, np.uint8, size, offset), count=ticks).astype(bool).tolist()
+        offset += size
+        trace = None
+        if flags & FLAG_TRACE:
+            trace = np.empty((ticks, 4))
+            trace[:, :3] = np.frombuffer(data, '<f4', ticks * 3, offset).reshape(ticks, 3)
+            trace[:, 3] = np.frombuffer(data, np.uint8, ticks, offset + 12 * ticks)
+        return Replay(flip_target, tucks, params, seed if flags & FLAG_SEED else None, generation,
+                      genome_key, fitness, trace)
+
+    def save(self, path):
+        with open(path + '.tmp', 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return Replay.from_bytes(f.read())
+
+
+def record(genome, config, flip_target, params=sim.TRAINING_PARAMS, seed=None, generation=0, trace=False):
+    """
+    Dive one genome headless and record its decisions.
+    :param trace: bool, also keep the diver's position, angle and state on every tick
+    :return: Replay
+    """
+    net = neat.nn.FeedForwardNetwork.create(genome, config)
+    dive = sim.DiveSim(params)
+    total_angle = flip_target * 360
+    tucks = []
+    frames = []
+    while not dive.landed:
+        output = net.activate(dive.observation(total_angle))
+        decision = output.index(max(output))
+        # The network has two outputs, so every decision is a tuck or a release
+        tucks.append(decision == population.TUCK_ACTION)
+        dive.step(population.TUCK_ACTION if decision == population.TUCK_ACTION else population.RELEASE_ACTION)
+        if trace:
+            diver = dive.diver
+            frames.append((diver.position[0], diver.position[1], diver.angle, population.STATES.index(diver.state)))
+    return Replay(flip_target, tucks, params, seed, generation, genome.key,
+                  genome.fitness or 0.0, np.array(frames) if trace else None)
+
+
+class ReplayRecorder(neat.reporting.BaseReporter):
+    """
+    Reporter that saves a replay of each generation's best genome for every flip target.
+
+    The best genome dives again on its own, which costs one headless episode per target
+    and no rendering.
+    """
+    def __init__(self, targets, directory='replays', seed=None, params=sim.TRAINING_PARAMS, trace=False):
+        """
+        :param targets: list of flip requirements to record
+        :param directory: str, where replay files are written
+        :param seed: int, seed of the run, stored in each replay
+        :param trace: bool, store the full state trace as well
+        """
+        self.directory = directory
+        self.targets = targets
+        self.seed = seed
+        self.params = params
+        self.trace = trace
+        self.generation = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        for target in self.targets:
+            replay = record(best_genome, config, target, self.params, self.seed, self.generation, self.trace)
+            replay.save(os.path.join(self.directory, f'gen-{self.generation:05d}-{target:g}.cdr'))
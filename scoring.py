@@ -0,0 +1,100 @@
+"""
+Landing rewards, scored for a whole batch of divers at once.
+
+A fitness function takes NumPy arrays with one entry per landing: the final angle, the
+state index (see population.STATES), the target angle in degrees and the tick the
+diver hit the water. It returns the fitness gained by each landing as a float array.
+Functions are registered by name and picked with the `function` key of the [Fitness]
+section of the NEAT config file:
+
+    [Fitness]
+    function = default
+"""
+import configparser
+
+import numpy as np
+
+import population
+
+
+DEFAULT = 'default'
+
+functions = {}
+
+
+def register(name):
+    """
+    Decorator that makes a fitness function selectable by `name`.
+    """
+    def decorator(function):
+        functions[name] = function
+        return function
+    return decorator
+
+
+def configured(config_path):
+    """
+    :return: str, name of the fitness function chosen in the config file, DEFAULT when it has none
+    """
+    parser = configparser.ConfigParser()
+    parser.read(config_path)
+    name = parser.get('Fitness', 'function', fallback=DEFAULT)
+    if name not in functions:
+        raise ValueError(f"Unknown fitness function {name!r}, expected one of {', '.join(sorted(functions))}")
+    return name
+
+
+def get(config):
+    """
+    :param config: neat.Config, with the name from configured() stored as config.fitness_function
+    :return: the fitness function to score with
+    """
+    return functions[getattr(config, 'fitness_function', DEFAULT)]
+
+
+def _difference(angles, targets):
+    return np.abs(np.asarray(angles, dtype=float) - np.asarray(targets, dtype=float))
+
+
+def _alignment(angles, targets):
+    difference = _difference(angles, targets)
+    with np.errstate(divide='ignore'):
+        value = np.where(difference <= 90, 1000 / difference, 100 / difference)
+    return np.where(difference == 0, 200.0, value)
+
+
+@register('default')
+def default(angles, states, targets, ticks):
+    """
+    The original reward: 1000 / difference within 90 degrees of the target, 100 / difference
+    beyond that and 200 for an exact match. The original compared the state with 'Straight',
+    which no state is ever called, so every landing gets the -0.1 of a bad entry and the
+    same happens here.
+    """
+    return -0.1 + _alignment(angles, targets)
+
+
+@register('straight_entry')
+def straight_entry(angles, states, targets, ticks):
+    """
+    The default reward with the entry term working: +0.1 for a straight entry, -0.1 otherwise.
+    """
+    return np.where(np.asarray(states) == population.STRAIGHT, 0.1, -0.1) + _alignment(angles, targets)
+
+
+@register('gaussian')
+def gaussian(angles, states, targets, ticks, width=45.0):
+    """
+    A smooth reward with no spike at an exact match: 200 at the target, falling off with a
+    standard deviation of `width` degrees, plus 10 for a straight entry.
+    """
+    difference = _difference(angles, targets)
+    return 200.0 * np.exp(-0.5 * (difference / width) ** 2) + np.where(np.asarray(states) == population.STRAIGHT, 10.0, 0.0)
+
+
+@register('linear')
+def linear(angles, states, targets, ticks):
+    """
+    200 at the target, falling linearly to 0 one full flip away.
+    """
+    return 200.0 * np.maximum(0.0, 1.0 - _difference(angles, targets) / 360.0)
@@ -0,0 +1,329 @@
+"""
+Pygame-free physics for the cliff diver.
+
+The classes in drawables.py add sprites on top of the ones in here. Everything in this
+module is plain numbers, so the simulation runs without a display or any surfaces.
+The collision outlines come from imgs/shapes.json, which `python sim.py` rebuilds
+from the images.
+"""
+import json
+import os
+from dataclasses import dataclass
+
+
+SHAPES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'imgs', 'shapes.json')
+
+sprite_paths = {
+    'standing': 'imgs/Standing.png',
+    'straight': 'imgs/Entry2.png',
+    'tuck': 'imgs/Tuck.png'
+}
+cliff_paths = {
+    'cliff_top': 'imgs/Cliff1.png',
+    'cliff_middle': 'imgs/Cliff3.png'
+}
+
+BASE_PADDING = (450, 100)  # Pixels added to the width and height of the Base images when scaling
+BASE_OFFSET = (100, 130)  # Where the base mask sits relative to the diver when testing collisions
+flip_requirements = [x * 0.5 for x in range(1, 10)]  # Flip targets divers train for, 0.5 to 4.5 in steps of 0.5
+
+
+@dataclass(frozen=True)
+class DiveParams:
+    """
+    Every constant the physics uses. Game.py plays with GAME_PARAMS, diving.py trains with TRAINING_PARAMS.
+    """
+    start_position: tuple = (90, 40)
+    jump_velocity_x: float = 2
+    jump_velocity_y: float = -10
+    gravity: float = 0.5
+    push: float = 0.5  # Extra horizontal speed per tick while x is below push_limit
+    push_limit: float = 50
+    takeoff_floor: float = 41  # update() only moves the diver while it is above this y
+    straight_spin: float = 0.3  # Degrees per tick in the straight position
+    tuck_spin: float = 13  # Degrees per tick in the tuck position
+    fall_speed: float = 10  # Pixels per tick once the cliff is fixed
+    cliff_start_y: float = 70
+    cliff_vel: float = 5
+    base_vel: float = 5
+    base_bottom: float = 1400  # Base starts with its bottom edge at this y
+    screen_height: int = 600
+
+
+GAME_PARAMS = DiveParams()
+TRAINING_PARAMS = DiveParams(straight_spin=0.6, tuck_spin=30, fall_speed=20,
+                             cliff_vel=0.7, base_vel=0.8, base_bottom=1550)
+
+
+class Shape:
+    """
+    Opaque pixels of one image, stored per column as (first_row, last_row) runs.
+    """
+    def __init__(self, width, height, columns):
+        self.width = width
+        self.height = height
+        self.columns = columns
+        rows = [run for column in columns for run in column]
+        self.top = min((run[0] for run in rows), default=None)  # First and last opaque rows, None if empty
+        self.bottom = max((run[1] for run in rows), default=None)
+
+    def overlap(self, other, offset):
+        """
+        Same answer as pygame's Mask.overlap: True if `other`, placed at `offset`, touches this shape.
+        Float offsets are truncated towards zero like pygame does.
+        """
+        return self.sweep(other, offset[0], offset[1], offset[1])
+
+    def sweep(self, other, ox, first_oy, last_oy):
+        """
+        True if `other` touches this shape anywhere while its vertical offset moves from first_oy
+        to last_oy, so a large step can't pass through a thin overlap.
+        """
+        ox = int(ox)
+        low, high = sorted((int(first_oy), int(last_oy)))
+        # Broad phase: the opaque rows of the two shapes can't meet anywhere in the sweep
+        if self.top is None or other.top is None:
+            return False
+        if high < self.top - other.bottom or low > self.bottom - other.top:
+            return False
+        for x in range(max(0, ox), min(self.width, ox + other.width)):
+            for top, bottom in self.columns[x]:
+                for other_top, other_bottom in other.columns[x - ox]:
+                    if max(low, top - other_bottom) <= min(high, bottom - other_top):
+                        return True
+        return False
+
+
+_shapes = {}
+
+
+def load_shapes(path=SHAPES_PATH):
+    """
+    Load the collision shapes once per process.
+    :return: dict of name -> Shape for every sprite state, the base and the cliff sections
+    """
+    if path not in _shapes:
+        with open(path) as f:
+            data = json.load(f)
+        _shapes[path] = {name: Shape(s['width'], s['height'], [[tuple(run) for run in col] for col in s['columns']])
+                         for name, s in data.items()}
+    return _shapes[path]
+
+
+def build_shapes(path=SHAPES_PATH):
+    """
+    Rebuild shapes.json from the images. This is the only function here that needs pygame.
+    """
+    import pygame
+
+    def shape_of(surface):
+        mask = pygame.mask.from_surface(surface)
+        width, height = mask.get_size()
+        columns = []
+        for x in range(width):
+            runs = []
+            start = None
+            for y in range(height + 1):
+                solid = y < height and mask.get_at((x, y))
+                if solid and start is None:
+                    start = y
+                elif not solid and start is not None:
+                    runs.append([start, y - 1])
+                    start = None
+            columns.append(runs)
+        return {'width': width, 'height': height, 'columns': columns}
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    data = {}
+    for name, image_path in {**sprite_paths, **cliff_paths}.items():
+        data[name] = shape_of(pygame.image.load(image_path).convert_alpha())
+    base_image = pygame.image.load('imgs/Base0.png').convert_alpha()
+    base_image = pygame.transform.scale(base_image, (base_image.get_width() + BASE_PADDING[0],
+                                                     base_image.get_height() + BASE_PADDING[1]))
+    data['base'] = shape_of(base_image)
+    with open(path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    pygame.quit()
+
+
+class Diver:
+    """
+    Position, velocity, rotation and state of a single diver.
+    """
+    def __init__(self, position, params=GAME_PARAMS):
+        self.params = params
+        self.original_position = position
+        self.position = position
+        self.state = 'standing'
+        self.velocity = 20  # Increased jump velocity for more noticeable effect
+        self.angle = 0  # Initial angle of rotation
+        self.total_flips = 0
+        self.previous_offset = None  # Offset from the base at the last collision check
+
+    def jump(self):
+        if self.state == 'standing':  # Ensure jump only from standing
+            self.state = 'straight'  # Change the state to 'jumping'
+            self.velocity_x = self.params.jump_velocity_x  # Horizontal velocity to move forward
+            self.velocity_y = self.params.jump_velocity_y  # Initial upward velocity for the jump
+
+    def tuck(self):
+        if self.state == 'straight':  # Ensure tuck only if in straight
+            self.state = 'tuck'
+
+    def release_tuck(self):
+        if self.state == 'tuck':  # Ensure we go back to straight only if we were tucking
+            self.state = 'straight'
+
+    def update(self, jump):
+        if jump and self.position[1] < self.params.takeoff_floor:
+            # Apply horizontal and vertical velocities to position
+            self.position = (self.position[0] + self.velocity_x, self.position[1] + self.velocity_y)
+            # Apply gravity to vertical velocity
+            self.velocity_y += self.params.gravity
+            if self.position[0] < self.params.push_limit:
+                self.velocity_x += self.params.push
+
+    def finalize_flip_count(self):
+        # Calculate total half flips based purely on rotation
+        self.total_flips = round(abs(self.angle) / 180)
+        if self.total_flips % 2 == 0:
+            self.total_flips /= 2
+        else:
+            self.total_flips -= 1
+            self.total_flips /= 2
+            self.total_flips += 0.5
+
+    def update2(self):
+        # Automatically apply gravity if not standing
+        if self.state != 'standing':
+            self.position = (self.position[0], self.position[1] + self.params.fall_speed)
+
+    def rotate(self):
+        if self.state == 'straight':
+            self.angle += self.params.straight_spin  # Slow rotation in straight position
+        elif self.state == 'tuck':
+            self.angle += self.params.tuck_spin  # Fast rotation in tuck position
+
+
+class Cliff:
+    """
+    Scroll position of the cliff, which moves upward until its middle section is fixed.
+    """
+    def __init__(self, params=GAME_PARAMS, shapes=None):
+        shapes = shapes or load_shapes()
+        self.params = params
+        self.top_height = shapes['cliff_top'].height
+        self.middle_height = shapes['cliff_middle'].height
+        self.screen_height = params.screen_height
+        self.y = params.cliff_start_y  # Start the cliffs just off the bottom of the screen
+        self.current_section = 'top'
+        self.middle_fixed = False  # Control if the middle section is fixed
+        self.moving = False
+
+    def move(self):
+        """
+        Move the cliff upward by decreasing the y position.
+        """
+        if not self.middle_fixed and self.moving:
+            self.y -= self.params.cliff_vel
+
+            # Check if we need to switch from the top to the middle section
+            if self.current_section == 'top' and self.y + self.top_height < self.screen_height:
+                self.current_section = 'middle'
+                # The middle cliff starts exactly at the point where the top cliff ends
+                self.y = 0
+
+            # Fix the middle section in place when it reaches the bottom of the screen
+            if self.current_section == 'middle' and self.y < self.screen_height - self.middle_height:
+                self.middle_fixed = True
+                self.y = self.screen_height - self.middle_height
+
+    def start_moving(self):
+        """
+        Start the cliff moving upward.
+        """
+        self.moving = True
+
+
+class Base:
+    """
+    Height of the water, which rises with the cliff until the cliff is fixed.
+    """
+    def __init__(self, params=GAME_PARAMS, shapes=None):
+        self.shapes = shapes or load_shapes()
+        self.params = params
+        self.height = self.shapes['base'].height
+        self.y = params.base_bottom - self.height
+
+    def move(self, fixed, curr_section):
+        if fixed or curr_section == 'standing':
+            return
+        else:
+            self.y -= self.params.base_vel
+
+    def collide(self, diver):
+        """
+        Check for collision between the base and the diver using the stored outlines, swept over
+        the vertical distance the diver moved relative to the base since its last check.
+        """
+        offset = (int(BASE_OFFSET[0] - diver.position[0]), int(self.y - diver.position[1] + BASE_OFFSET[1]))
+        previous = diver.previous_offset[1] if diver.previous_offset else offset[1]
+        diver.previous_offset = offset
+        return self.shapes[diver.state].sweep(self.shapes['base'], offset[0], previous, offset[1])
+
+
+class DiveSim:
+    """
+    One diver on its own cliff and water, advanced one tick at a time in the same
+    order diving.fitness uses.
+    """
+    def __init__(self, params=TRAINING_PARAMS, shapes=None):
+        self.params = params
+        self.shapes = shapes or load_shapes()
+        self.reset()
+
+    def reset(self):
+        self.diver = Diver(self.params.start_position, self.params)
+        self.cliff = Cliff(self.params, self.shapes)
+        self.base = Base(self.params, self.shapes)
+        self.landed = False
+        self.ticks = 0
+
+    def observation(self, total_angle):
+        """
+        The network inputs diving.fitness feeds in: target angle, current angle and height above the base.
+        """
+        return [total_angle, self.diver.angle, self.diver.position[1] - self.base.y]
+
+    def step(self, action):
+        """
+        Advance one tick.
+        :param action: 0 tucks, 1 releases the tuck, None leaves the diver as it is
+        :return: bool, True once the diver has hit the water
+        """
+        if self.landed:
+            return True
+        diver, cliff, base = self.diver, self.cliff, self.base
+        diver.jump()
+        if action == 0:
+            diver.tuck()
+        if action == 1:
+            diver.release_tuck()
+        diver.update(True)
+        diver.rotate()
+        collide = base.collide(diver)
+        cliff.start_moving()
+        cliff.move()
+        if cliff.middle_fixed:
+            diver.update2()
+        base.move(cliff.middle_fixed, diver.state)
+        self.ticks += 1
+        if collide:
+            self.landed = True
+            diver.finalize_flip_count()
+        return self.landed
+
+
+if __name__ == "__main__":
+    build_shapes()
@@ -0,0 +1,278 @@
+"""
+Live view of headless training from a separate process.
+
+The evaluator publishes the positions, angles and states of a few divers into a ring
+buffer in shared memory after every tick. A spectator process draws the newest frame
+at its own frame rate with the usual sprites. Publishing never waits: each slot carries
+a sequence number that is odd while it is being written, and the spectator drops any
+frame that was overwritten while it was reading it.
+
+    python diving.py --spectate 8
+"""
+import multiprocessing
+import random
+from multiprocessing import resource_tracker, shared_memory
+
+import neat
+import numpy as np
+
+import population
+import sim
+
+
+CAPACITY = 8  # Frames kept in the ring, the spectator only ever draws the newest
+LANDED = len(population.STATES)  # State code for a diver already in the water
+
+
+def _slot_dtype(size):
+    return np.dtype([
+        ('seq', np.int64),
+        ('generation', np.int64),
+        ('tick', np.int64),
+        ('count', np.int64),
+        ('target', np.float64),
+        ('cliff_y', np.float64),
+        ('cliff_section', np.int64),
+        ('base_y', np.float64),
+        ('key', np.int64, (size,)),
+        ('x', np.float32, (size,)),
+        ('y', np.float32, (size,)),
+        ('angle', np.float32, (size,)),
+        ('state', np.int8, (size,)),
+    ])
+
+
+class RingBuffer:
+    """
+    Frames of up to `size` divers in shared memory. One process writes, any number read.
+    """
+    HEADER = 4  # int64s: frames written, capacity, size, closed
+
+    def __init__(self, name=None, size=8, capacity=CAPACITY):
+        """
+        :param name: str, shared memory block to attach to, a new block is created when None
+        :param size: int, most divers in a frame, ignored when attaching
+        :param capacity: int, frames in the ring, ignored when attaching
+        """
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=8 * self.HEADER + capacity * _slot_dtype(size).itemsize)
+            self.header = np.ndarray((self.HEADER,), np.int64, self.memory.buf)
+            self.header[:] = (0, capacity, size, 0)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.header = np.ndarray((self.HEADER,), np.int64, self.memory.buf)
+        self.name = self.memory.name
+        self.capacity = int(self.header[1])
+        self.size = int(self.header[2])
+        self.slots = np.ndarray((self.capacity,), _slot_dtype(self.size), self.memory.buf, 8 * self.HEADER)
+        self.frames = int(self.header[0])
+        self.dropped = 0
+
+    def write(self, generation, tick, target, cliff, base, keys, x, y, angle, state):
+        """
+        Publish one frame. Never blocks, older frames are simply overwritten.
+        :param cliff: sim.Cliff shared by the divers
+        :param base: sim.Base shared by the divers
+        :param keys, x, y, angle, state: arrays of at most `size` divers
+        """
+        i = self.frames % self.capacity
+        slots = self.slots
+        count = min(len(x), self.size)
+        slots['seq'][i] = 2 * self.frames + 1  # Odd while the slot is being written
+        slots['generation'][i] = generation
+        slots['tick'][i] = tick
+        slots['count'][i] = count
+        slots['target'][i] = target
+        slots['cliff_y'][i] = cliff.y
+        slots['cliff_section'][i] = cliff.current_section == 'middle'
+        slots['base_y'][i] = base.y
+        slots['key'][i, :count] = keys[:count]
+        slots['x'][i, :count] = x[:count]
+        slots['y'][i, :count] = y[:count]
+        slots['angle'][i, :count] = angle[:count]
+        slots['state'][i, :count] = state[:count]
+        slots['seq'][i] = 2 * self.frames + 2
+        self.frames += 1
+        self.header[0] = self.frames
+
+    def read(self):
+        """
+        :return: the newest complete frame as a dict of copies, or None when there is no new
+                 frame or it was overwritten while being read
+        """
+        frames = int(self.header[0])
+        if frames == 0 or frames == self.frames:
+            return None
+        if frames - self.frames > 1:
+            self.dropped += frames - self.frames - 1
+        self.frames = frames
+        i = (frames - 1) % self.capacity
+        seq = int(self.slots['seq'][i])
+        if seq != 2 * (frames - 1) + 2:
+            self.dropped += 1
+            return None
+        slot = self.slots[i].copy()
+        if int(self.slots['seq'][i]) != seq:
+            self.dropped += 1
+            return None
+        count = int(slot['count'])
+        frame = {name: slot[name] for name in ('generation', 'tick', 'target', 'cliff_y', 'cliff_section', 'base_y')}
+        frame.update({name: slot[name][:count] for name in ('key', 'x', 'y', 'angle', 'state')})
+        return frame
+
+    def closed(self):
+        return bool(self.header[3])
+
+    def close(self):
+        """
+        Detach, and when this process created the block, tell the readers and remove it.
+        """
+        if self.owner:
+            self.header[3] = 1
+        self.header = self.slots = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class Feed(neat.reporting.BaseReporter):
+    """
+    Writer side used by diving.episodes: picks which divers to show and publishes them every
+    tick. Added as a reporter, it also labels the frames with the generation.
+    """
+    def __init__(self, size=8, mode='top'):
+        """
+        :param size: int, divers shown at once
+        :param mode: 'top' for the genomes of the generation with the best fitness before it is
+                     evaluated, elites and cached genomes included, 'sample' for a random subset
+        """
+        self.ring = RingBuffer(size=size)
+        self.mode = mode
+        self.generation = 0
+        self.rows = None
+        self.keys = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.keys = None
+
+    def choose(self, genomes):
+        """
+        Choose the divers to show out of the whole generation, cached genomes included.
+        diving.evaluate dives the chosen ones even when their fitness is cached.
+        :param genomes: list of every genome of the generation
+        :return: set of the indices of the chosen genomes in `genomes`
+        """
+        size = min(self.ring.size, len(genomes))
+        if self.mode == 'sample':
+            chosen = random.Random(self.generation).sample(range(len(genomes)), size)
+        else:
+            chosen = sorted(range(len(genomes)), key=lambda x: -(genomes[x].fitness or 0.0))[:size]
+        self.keys = np.array(sorted(genomes[x].key for x in chosen), dtype=np.int64)
+        return set(chosen)
+
+    def start(self, genomes):
+        """
+        Find the chosen divers among those of the episode that is about to run, choosing
+        from them when choose was not called this generation.
+        :param genomes: list of genomes, in PopulationSim row order
+        """
+        if self.keys is None:
+            self.choose(genomes)
+        rows = {genome.key: x for x, genome in enumerate(genomes)}
+        self.keys = np.array([key for key in self.keys if key in rows], dtype=np.int64)
+        self.rows = np.array([rows[key] for key in self.keys], dtype=np.int64)
+
+    def publish(self, divers, target):
+        """
+        :param divers: population.PopulationSim after a step
+        :param target: float, flip requirement of the shown divers
+        """
+        rows = self.rows
+        state = divers.state[rows].astype(np.int8)
+        state[divers.landed[rows]] = LANDED
+        self.ring.write(self.generation, divers.ticks, target, divers.cliff, divers.base, self.keys,
+                        divers.x[rows], divers.y[rows], divers.angle[rows], state)
+
+    def spawn(self, fps=30):
+        """
+        Start a spectator process reading this feed.
+        :return: multiprocessing.Process
+        """
+        process = multiprocessing.get_context('spawn').Process(target=watch, args=(self.ring.name, fps), daemon=True)
+        process.start()
+        return process
+
+    def close(self):
+        self.ring.close()
+
+
+feed = None  # The Feed diving.episodes publishes to, if any
+
+
+def watch(name, fps=30, untracked=False):
+    """
+    Spectator process: draw the newest frame of the ring buffer `name` until the window
+    is closed or the writer goes away.
+    :param untracked: bool, set when the process was not started by Feed.spawn. It then has
+                      its own resource tracker, which would remove the block on exit.
+    """
+    import pygame
+    import assets
+    import drawables
+    import render
+
+    ring = RingBuffer(name)
+    if untracked:
+        resource_tracker.unregister(ring.memory._name, 'shared_memory')  # Only the writer removes the block
+    screen = assets.screen((800, 600))
+    assets.preload()
+    clock = pygame.time.Clock()
+    bg_color = (135, 206, 235)  # Sky blue background
+    pygame.display.set_caption("Stickman Cliff Diving - spectator")
+    renderer = render.DirtyRenderer(screen, bg_color)
+    image_paths = {
+        'standing': 'imgs/Standing.png',
+        'straight': 'imgs/Entry2.png',
+        'tuck': 'imgs/Tuck.png'
+    }
+    divers = [drawables.Character(image_paths, (90, 40), sim.TRAINING_PARAMS) for _ in range(ring.size)]
+    cliff = drawables.Cliff(drawables.cliff_images, 0, screen.get_height(), sim.TRAINING_PARAMS)
+    base = drawables.Base(assets.base_images(), sim.TRAINING_PARAMS)
+    frame = None
+
+    while not ring.closed():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                ring.close()
+                pygame.quit()
+                return
+
+        frame = ring.read() or frame
+        if frame is not None:
+            cliff.y = float(frame['cliff_y'])
+            cliff.current_section = 'middle' if frame['cliff_section'] else 'top'
+            base.y = float(frame['base_y'])
+            scene = []
+            for slot, diver in enumerate(divers[:len(frame['x'])]):
+                state = int(frame['state'][slot])
+                if state == LANDED:
+                    continue
+                diver.state = population.STATES[state]
+                diver.position = (float(frame['x'][slot]), float(frame['y'][slot]))
+                diver.angle = float(frame['angle'][slot])
+                scene.append((('diver', slot),) + diver.sprite(False))
+            scene.append(('cliff',) + cliff.sprite())
+            scene.extend((('base', i),) + sprite for i, sprite in enumerate(base.sprites()))
+            label = (f"Gen {frame['generation']}  Flips: {frame['target']:g}  "
+                     f"tick {frame['tick']}  dropped {ring.dropped}")
+            scene.append(('text', assets.text(label, 28, (255, 255, 255)), (10, 10)))
+            renderer.render(scene)
+        clock.tick(fps)
+    ring.close()
+
+
+if __name__ == "__main__":
+    import sys
+    watch(sys.argv[1], untracked=True)
@@ -0,0 +1,54 @@
+"""
+Time-based splash animation for a diver landing in the water.
+
+The splash grows through the Base images and shrinks back, one image every
+`frame_time` seconds. It only keeps time and picks images, drawables.Base.sprites()
+draws them as part of the normal frame.
+"""
+
+
+def splash_size(angle):
+    """
+    :param angle: float, the diver's rotation when it hit the water
+    :return: int, number of Base images the splash grows through, 2 for a clean entry up to 5
+    """
+    angle %= 360
+    if 0 <= angle < 5 or 355 < angle <= 360 or 175 < angle < 185:
+        return 2  # Minimal splash
+    elif 5 <= angle < 55 or 305 < angle <= 355 or 140 < angle < 175 or 185 <= angle < 220:
+        return 3  # Small splash
+    elif 55 <= angle < 80 or 285 < angle <= 305 or 100 < angle < 140 or 220 <= angle < 260:
+        return 4  # Medium splash
+    return 5  # Large splash, the most frames for the most dramatic splash
+
+
+class Splash:
+    """
+    Which Base images to draw at each moment of one splash.
+    """
+    def __init__(self, angle, image_count=5, frame_time=0.1):
+        """
+        :param angle: float, the diver's rotation when it hit the water
+        :param image_count: int, number of Base images available
+        :param frame_time: float, seconds each step of the animation stays on screen
+        """
+        size = min(splash_size(angle), image_count)
+        # Growing, each image lands on top of the smaller ones. Shrinking, one image at a time.
+        self.frames = [tuple(range(i + 1)) for i in range(size)] + [(j,) for j in range(size - 1, -1, -1)]
+        self.frame_time = frame_time
+        self.elapsed = 0.0
+
+    def update(self, dt):
+        """
+        :param dt: float, seconds since the last update
+        """
+        self.elapsed += dt
+
+    def done(self):
+        return self.elapsed >= len(self.frames) * self.frame_time
+
+    def images(self):
+        """
+        :return: tuple of Base image indices to draw now, bottom first
+        """
+        return self.frames[min(int(self.elapsed / self.frame_time), len(self.frames) - 1)]
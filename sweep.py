@@ -0,0 +1,226 @@
+"""
+Hyperparameter sweeps over the NEAT config.
+
+A sweep spec is a JSON file naming the config keys to vary, as "Section.key" or just
+"key" when only one section has it:
+
+    {
+        "base": "config_feedforward.txt",
+        "search": "grid",
+        "generations": 50,
+        "params": {
+            "pop_size": [20, 50, 100],
+            "DefaultGenome.conn_add_prob": [0.3, 0.5],
+            "compatibility_threshold": [2.0, 3.0],
+            "activation_options": ["relu", "relu sigmoid tanh"]
+        }
+    }
+
+"search": "random" draws "trials" settings instead, from lists or from ranges written as
+{"uniform": [low, high]}, {"log_uniform": [low, high]} or {"int": [low, high]}. A "run"
+object is passed on to diving.run, e.g. {"scenarios": [1.0, 2.5, 4.0]}.
+
+Each trial gets its own directory with the derived config, its log and its checkpoints.
+Finished trials are appended to results.csv in the sweep directory. Running the same spec
+again skips them, and picks unfinished trials back up from their checkpoints.
+
+    python sweep.py spec.json --out sweeps/first --cores 4
+"""
+import argparse
+import configparser
+import contextlib
+import csv
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS = 'results.csv'
+FIELDS = ('trial', 'seed', 'best_fitness', 'generations', 'threshold_generation', 'wall_time')
+
+
+def read_config(path):
+    parser = configparser.ConfigParser()
+    parser.read(path)
+    return parser
+
+
+def resolve(parser, name):
+    """
+    :param name: str, "Section.key", or "key" when exactly one section of the config has it
+    :return: (section, key)
+    """
+    if '.' in name:
+        section, key = name.split('.', 1)
+        if not parser.has_option(section, key):
+            raise KeyError(f"{section} has no {key} in the base config")
+        return section, key
+    sections = [section for section in parser.sections() if parser.has_option(section, name)]
+    if len(sections) != 1:
+        raise KeyError(f"{name} is in {len(sections)} sections of the base config, write it as Section.{name}")
+    return sections[0], name
+
+
+def _draw(rng, choices):
+    if isinstance(choices, list):
+        return rng.choice(choices)
+    (kind, (low, high)), = choices.items()
+    if kind == 'uniform':
+        return rng.uniform(low, high)
+    if kind == 'log_uniform':
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    if kind == 'int':
+        return rng.randint(low, high)
+    raise ValueError(f"Unknown range {kind!r}")
+
+
+def trials(spec):
+    """
+    :return: list of dicts of param name -> value, one per trial, the same for the same spec
+    """
+    params = spec['params']
+    names = sorted(params)
+    if spec.get('search', 'grid') == 'grid':
+        for name in names:
+            if not isinstance(params[name], list):
+                raise ValueError(f"Grid search needs a list of values for {name}")
+        return [dict(zip(names, values)) for values in itertools.product(*(params[name] for name in names))]
+    rng = random.Random(spec.get('seed', 0))
+    return [{name: _draw(rng, params[name]) for name in names} for _ in range(spec['trials'])]
+
+
+def trial_id(settings, spec):
+    """
+    :return: str, short hash of the trial's settings and everything else that changes its result
+    """
+    key = (sorted(settings.items()), spec.get('base'), spec.get('generations'), sorted(spec.get('run', {}).items()))
+    return hashlib.sha1(repr(key).encode()).hexdigest()[:12]
+
+
+def derive(base, settings, path):
+    """
+    Write a copy of the base config with the trial's settings to `path`.
+    """
+    parser = read_config(base)
+    for name, value in settings.items():
+        section, key = resolve(parser, name)
+        parser.set(section, key, str(value))
+    with open(path, 'w') as f:
+        parser.write(f)
+
+
+def run_trial(config_path, directory, seed, generations, options):
+    """
+    One training run in a worker process, logged to its directory.
+    :return: dict with the FIELDS measured by the run
+    """
+    import checkpoint
+    import diving
+
+    checkpoints = os.path.join(directory, 'checkpoints')
+    resume = checkpoints if checkpoint.checkpoints(checkpoints) else None
+    start = time.perf_counter()
+    with open(os.path.join(directory, 'log.txt'), 'a') as log, contextlib.redirect_stdout(log):
+        winner, stats = diving.run(config_path, seed=seed, checkpoint_dir=checkpoints, resume=resume,
+                                   generations=generations, **options)
+    threshold = read_config(config_path).getfloat('NEAT', 'fitness_threshold')
+    best = [genome.fitness for genome in stats.most_fit_genomes]
+    reached = [g for g, fitness in enumerate(best) if fitness >= threshold]
+    return {
+        'best_fitness': max(best) if best else winner.fitness,
+        'generations': len(best),
+        'threshold_generation': reached[0] if reached else '',
+        'wall_time': time.perf_counter() - start,
+    }
+
+
+def finished(directory, fields):
+    """
+    :param fields: tuple of the columns this sweep writes
+    :return: set of trial ids already in the results table
+    """
+    path = os.path.join(directory, RESULTS)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        if tuple(reader.fieldnames or ()) != fields:
+            raise ValueError(f"{path} has the columns {', '.join(reader.fieldnames or ())} but this sweep writes "
+                             f"{', '.join(fields)}, use another --out directory for a different set of params")
+        return {row['trial'] for row in reader}
+
+
+def sweep(spec, directory, cores=None, workers_per_trial=1):
+    """
+    Run every trial of the spec that is not in the results table yet.
+    :param cores: int, CPU budget, os.cpu_count() when None
+    :param workers_per_trial: int, headless worker processes each trial evaluates with
+    :return: list of result rows finished by this call
+    """
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(LOCAL_DIR, spec.get('base', 'config_feedforward.txt'))
+    generations = spec.get('generations', 100)
+    options = dict(spec.get('run', {}), workers=workers_per_trial)
+    settings = trials(spec)
+    names = sorted(spec['params'])
+    fields = FIELDS + tuple(names)
+    done = finished(directory, fields)
+
+    pending = []
+    for values in settings:
+        trial = trial_id(values, spec)
+        if trial in done:
+            continue
+        trial_dir = os.path.join(directory, trial)
+        os.makedirs(trial_dir, exist_ok=True)
+        config_path = os.path.join(trial_dir, 'config.txt')
+        derive(base, values, config_path)
+        pending.append((trial, values, config_path, trial_dir, int(trial[:8], 16)))
+    print(f"{len(settings)} trials, {len(settings) - len(pending)} already done, {len(pending)} to run")
+
+    results = []
+    path = os.path.join(directory, RESULTS)
+    slots = max(1, (cores or os.cpu_count()) // workers_per_trial)
+    with ProcessPoolExecutor(slots) as pool, open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fields)
+        if f.tell() == 0:
+            writer.writeheader()
+        jobs = {pool.submit(run_trial, config_path, trial_dir, seed, generations, options): (trial, values, seed)
+                for trial, values, config_path, trial_dir, seed in pending}
+        for job in as_completed(jobs):
+            trial, values, seed = jobs[job]
+            try:
+                row = dict(job.result(), trial=trial, seed=seed, **values)
+            except Exception as e:
+                print(f"trial {trial} failed: {e!r}, it runs again next time")
+                continue
+            writer.writerow(row)
+            f.flush()
+            results.append(row)
+            print(f"trial {trial}: best fitness {row['best_fitness']:.3f} after {row['generations']} generations "
+                  f"in {row['wall_time']:.1f} sec")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep NEAT hyperparameters")
+    parser.add_argument("spec", help="JSON sweep spec")
+    parser.add_argument("--out", default=None, help="sweep directory, sweeps/<spec name> by default")
+    parser.add_argument("--cores", type=int, default=None, help="CPU budget, one per CPU by default")
+    parser.add_argument("--workers-per-trial", type=int, default=1, help="worker processes each trial evaluates with")
+    parser.add_argument("--list", action="store_true", help="print the trials and exit")
+    args = parser.parse_args()
+    with open(args.spec) as f:
+        spec = json.load(f)
+    if args.list:
+        for values in trials(spec):
+            print(trial_id(values, spec), values)
+    else:
+        out = args.out or os.path.join('sweeps', os.path.splitext(os.path.basename(args.spec))[0])
+        sweep(spec, out, args.cores, args.workers_per_trial)
@@ -0,0 +1,49 @@
+import os
+import random
+
+import neat
+import numpy as np
+
+import batchnet
+
+
+def mutated_genomes(count=120, seed=0):
+    """
+    Genomes grown well past the config's starting point, with hidden nodes and every
+    activation BatchNetwork compiles. The last one sums nothing, so it takes the fallback.
+    """
+    random.seed(seed)
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, neat.DefaultSpeciesSet,
+                                neat.DefaultStagnation, os.path.join(os.path.dirname(__file__), 'config_feedforward.txt'))
+    genome_config = config.genome_config
+    genome_config.activation_options = ['relu', 'sigmoid', 'tanh', 'sin', 'gauss', 'identity', 'abs', 'clamped']
+    genome_config.activation_mutate_rate = 0.5
+    genome_config.node_add_prob = 0.5
+    genomes = []
+    for key in range(count):
+        genome = neat.DefaultGenome(key)
+        genome.configure_new(genome_config)
+        for _ in range(random.randint(1, 15)):
+            genome.mutate(genome_config)
+        genomes.append(genome)
+    for node in genomes[-1].nodes.values():
+        node.aggregation = 'max'
+    return genomes, config
+
+
+def test_batch_network_matches_feed_forward_network():
+    genomes, config = mutated_genomes()
+    assert any(len(genome.nodes) > config.genome_config.num_outputs for genome in genomes)
+    assert len({node.activation for genome in genomes for node in genome.nodes.values()}) > 4
+    nets = batchnet.BatchNetwork.create(genomes, config)
+    assert len(nets.fallbacks) == 1
+
+    inputs = np.random.default_rng(0).uniform(-500, 500, size=(4, len(genomes), config.genome_config.num_inputs))
+    outputs = nets.activate(inputs)
+    decisions = nets.decide(inputs)
+    for x, genome in enumerate(genomes):
+        reference = neat.nn.FeedForwardNetwork.create(genome, config)
+        for batch in range(inputs.shape[0]):
+            expected = reference.activate(inputs[batch, x].tolist())
+            np.testing.assert_allclose(outputs[batch, x], expected, rtol=1e-12, atol=1e-12)
+            assert decisions[batch, x] == expected.index(max(expected))
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import environment
+import population
+
+
+def test_vector_env_matches_population_sim():
+    assert environment.check_parity()
+
+
+def test_single_env_matches_vector_env():
+    actions = np.random.default_rng(1).integers(0, 2, size=(2000, 4))
+    envs = environment.VectorCliffDiveEnv(4, flips=[1.0, 2.5])
+    observations, _ = envs.reset(seed=3)
+    singles = [environment.CliffDiveEnv() for _ in range(4)]
+    for env, observation in zip(singles, observations):
+        env.reset()
+        env.total_angle = observation[0]
+    landings = [None] * 4
+    for tick in range(2000):
+        _, rewards, terminated, _, _ = envs.step(actions[tick])
+        for x, env in enumerate(singles):
+            if landings[x] is None:
+                _, reward, ended, _, _ = env.step(actions[tick, x])
+                if ended:
+                    landings[x] = (tick, reward)
+                    assert terminated[x] and rewards[x] == reward
+                else:
+                    assert not terminated[x]
+    assert None not in landings
+
+
+def test_subprocess_env_matches_in_process_env():
+    actions = np.random.default_rng(2).integers(0, 2, size=(1500, 6))
+    local = environment.VectorCliffDiveEnv(6)
+    remote = environment.SubprocVectorEnv(6, workers=2)
+    try:
+        assert np.array_equal(local.reset(seed=5)[0], remote.reset(seed=5)[0])
+        for tick in range(1500):
+            for a, b in zip(local.step(actions[tick])[:4], remote.step(actions[tick])[:4]):
+                assert np.array_equal(a, b)
+    finally:
+        remote.close()
+
+
+def test_step_after_landing_raises():
+    env = environment.CliffDiveEnv(flips=1.0)
+    env.reset(seed=0)
+    terminated = False
+    while not terminated:
+        _, _, terminated, _, _ = env.step(population.RELEASE_ACTION)
+    with pytest.raises(RuntimeError):
+        env.step(population.RELEASE_ACTION)
@@ -0,0 +1,10 @@
+import kernel
+
+
+def test_kernel_matches_numpy_step():
+    # Runs the compiled loops when Numba is installed, the plain Python ones otherwise
+    assert kernel.check_parity() is None
+
+
+def test_kernel_matches_numpy_step_tucking():
+    assert kernel.check_parity(n=50, seed=1, tuck_rate=0.8) is None